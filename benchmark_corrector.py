@@ -0,0 +1,347 @@
+"""
+Banco de pruebas de rendimiento del corrector de textos.
+
+Genera un corpus sintético en español a partir del léxico del corrector,
+con errores ortográficos, fechas, números, números romanos y abreviaturas
+en proporciones controladas, y mide para cada etapa del proceso el
+rendimiento (MB/s y tokens/s), la latencia por documento (p50/p99) y el
+pico de memoria. Los resultados pueden guardarse como línea base y
+compararse en ejecuciones posteriores para detectar regresiones. Con
+--compresion mide además la lectura y escritura del corpus comprimido.
+
+Uso:
+    python benchmark_corrector.py --documentos 500 --guardar-base base.json
+    python benchmark_corrector.py --documentos 500 --comparar base.json
+    python benchmark_corrector.py --documentos 500 --compresion none,gz,bz2,xz,zst
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from corrector_texto import ChangeLog, TextCorrector, open_text
+
+# Romanos que el corrector convierte a texto
+ROMANOS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XIV", "XIX", "XXI"]
+
+# Sustituciones habituales al teclear o al hacer OCR
+SIN_ACENTO = str.maketrans("áéíóúñ", "aeioun")
+
+def introducir_error(palabra, rng):
+    """Introduce un error ortográfico aleatorio en la palabra"""
+    if len(palabra) < 3:
+        return palabra
+
+    operacion = rng.choice(('borrar', 'repetir', 'cambiar', 'transponer', 'acento'))
+    posicion = rng.randrange(len(palabra))
+    if operacion == 'borrar':
+        return palabra[:posicion] + palabra[posicion + 1:]
+    if operacion == 'repetir':
+        return palabra[:posicion] + palabra[posicion] * rng.randint(2, 4) + palabra[posicion + 1:]
+    if operacion == 'cambiar':
+        return palabra[:posicion] + rng.choice('abcdefghijlmnopqrstuvz') + palabra[posicion + 1:]
+    if operacion == 'transponer' and posicion < len(palabra) - 1:
+        return palabra[:posicion] + palabra[posicion + 1] + palabra[posicion] + palabra[posicion + 2:]
+
+    sin_acento = palabra.translate(SIN_ACENTO)
+    return sin_acento if sin_acento != palabra else palabra[:-1]
+
+def generar_corpus(corrector, documentos=200, palabras=300, tasa_errores=0.05, tasa_fechas=0.01,
+                   tasa_numeros=0.03, tasa_romanos=0.005, tasa_abreviaturas=0.01, semilla=1):
+    """
+    Genera `documentos` textos de unas `palabras` palabras cada uno con las
+    palabras del léxico del corrector. Cada tasa es la probabilidad de que
+    una posición del texto sea un error, una fecha, un número, un romano o
+    una abreviatura.
+    """
+    rng = random.Random(semilla)
+    lexico = sorted(palabra for palabra in corrector.dictionary if len(palabra) > 1)
+    abreviaturas = sorted(corrector.abbreviation_dict)
+
+    corpus = []
+    for _ in range(documentos):
+        partes = []
+        inicio_frase = True
+        for _ in range(rng.randint(palabras // 2, palabras * 3 // 2)):
+            azar = rng.random()
+            if azar < tasa_fechas:
+                separador = rng.choice('/-')
+                parte = f"{rng.randint(1, 28):02d}{separador}{rng.randint(1, 12):02d}{separador}{rng.randint(1800, 2030)}"
+            elif azar < tasa_fechas + tasa_numeros:
+                parte = str(rng.choice((rng.randint(0, 100), rng.randint(100, 999), rng.randint(1500, 2030),
+                                        rng.randint(1000, 999999))))
+            elif azar < tasa_fechas + tasa_numeros + tasa_romanos:
+                parte = rng.choice(ROMANOS)
+            elif azar < tasa_fechas + tasa_numeros + tasa_romanos + tasa_abreviaturas:
+                parte = rng.choice(abreviaturas)
+            else:
+                parte = rng.choice(lexico)
+                if rng.random() < tasa_errores:
+                    parte = introducir_error(parte, rng)
+                if inicio_frase:
+                    parte = parte.capitalize()
+            inicio_frase = False
+
+            # Fin de frase o de línea de vez en cuando
+            if rng.random() < 0.08:
+                parte += '.'
+                inicio_frase = True
+            partes.append(parte)
+            partes.append('\n' if rng.random() < 0.06 else ' ')
+        corpus.append(''.join(partes).strip() + '.\n')
+
+    return corpus
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista de valores"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+def medir(corrector, corpus, track_changes=True):
+    """
+    Corrige el corpus midiendo cada etapa por separado.
+    Devuelve un diccionario con el rendimiento por etapa y la latencia por
+    documento.
+    """
+    etapas = corrector.stages
+    nombres = ['tokenize', 'prescan'] + list(etapas) + ['join']
+    tiempos = dict.fromkeys(nombres, 0.0)
+    omitidas = dict.fromkeys(etapas, 0)
+    latencias = []
+    total_bytes = 0
+    total_tokens = 0
+
+    for documento in corpus:
+        inicio = time.perf_counter()
+
+        tokens = corrector._tokenize(documento)
+        tiempos['tokenize'] += time.perf_counter() - inicio
+        cambios = ChangeLog(documento, tokens) if track_changes else None
+        hechos = bytearray(len(tokens))
+        total_tokens += len(tokens)
+        total_bytes += len(documento.encode('utf-8'))
+
+        marca = time.perf_counter()
+        saltar = corrector._prescan(documento, etapas)
+        tiempos['prescan'] += time.perf_counter() - marca
+        
+        for nombre in etapas:
+            if cambios is not None:
+                cambios.begin_stage(nombre)
+            if nombre in saltar:
+                omitidas[nombre] += 1
+                continue
+            marca = time.perf_counter()
+            getattr(corrector, corrector.STAGE_METHODS[nombre])(tokens, hechos, cambios)
+            tiempos[nombre] += time.perf_counter() - marca
+
+        marca = time.perf_counter()
+        ''.join(tokens)
+        fin = time.perf_counter()
+        tiempos['join'] += fin - marca
+        latencias.append(fin - inicio)
+
+    resultado_etapas = {}
+    for nombre in nombres:
+        segundos = max(tiempos[nombre], 1e-9)
+        resultado_etapas[nombre] = {
+            'segundos': round(tiempos[nombre], 6),
+            'mb_s': round(total_bytes / 1e6 / segundos, 3),
+            'tokens_s': round(total_tokens / segundos, 1)
+        }
+        if nombre in omitidas:
+            resultado_etapas[nombre]['omitida'] = omitidas[nombre]
+
+    total = sum(latencias)
+    return {
+        'documentos': len(corpus),
+        'bytes': total_bytes,
+        'tokens': total_tokens,
+        'etapas': resultado_etapas,
+        'total': {
+            'segundos': round(total, 6),
+            'mb_s': round(total_bytes / 1e6 / max(total, 1e-9), 3),
+            'tokens_s': round(total_tokens / max(total, 1e-9), 1)
+        },
+        'latencia_ms': {
+            'p50': round(percentil(latencias, 50) * 1000, 3),
+            'p99': round(percentil(latencias, 99) * 1000, 3)
+        }
+    }
+
+def medir_memoria(corrector, corpus, track_changes=True):
+    """Pico de memoria (MB, según tracemalloc) al corregir todo el corpus"""
+    tracemalloc.start()
+    try:
+        for documento in corpus:
+            corrector.correct(documento, track_changes=track_changes)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1e6, 3)
+
+def medir_compresion(corpus, formatos):
+    """
+    Escribe y vuelve a leer el corpus con cada formato de compresión.
+    Devuelve, por formato, el tamaño en disco (total y por documento) y el
+    rendimiento de escritura y lectura en MB/s de texto sin comprimir.
+    """
+    texto = '\n\n'.join(corpus)
+    megas = len(texto.encode('utf-8')) / 1e6
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for formato in formatos:
+            ruta = os.path.join(directorio, 'corpus.txt' + ('' if formato == 'none' else f'.{formato}'))
+            try:
+                inicio = time.perf_counter()
+                with open_text(ruta, 'w', formato) as archivo:
+                    archivo.write(texto)
+                escritura = time.perf_counter() - inicio
+            except (ImportError, ValueError) as e:
+                print(f"Formato {formato} no disponible: {e}")
+                continue
+            
+            inicio = time.perf_counter()
+            with open_text(ruta, 'r', formato) as archivo:
+                while archivo.read(1024 * 1024):
+                    pass
+            lectura = time.perf_counter() - inicio
+            
+            tamano = os.path.getsize(ruta)
+            resultados[formato] = {
+                'bytes_disco': tamano,
+                'bytes_documento': round(tamano / max(len(corpus), 1), 1),
+                'ratio': round(tamano / max(megas * 1e6, 1), 4),
+                'escritura_mb_s': round(megas / max(escritura, 1e-9), 2),
+                'lectura_mb_s': round(megas / max(lectura, 1e-9), 2)
+            }
+    return resultados
+
+def comparar(resultado, base, tolerancia):
+    """
+    Compara un resultado con la línea base. Devuelve la lista de
+    regresiones: etapas más lentas, latencia o memoria mayores que la base
+    en más de la tolerancia indicada (fracción, 0.2 = 20 %).
+    """
+    regresiones = []
+    for nombre, datos in base['etapas'].items():
+        actual = resultado['etapas'].get(nombre)
+        if actual and actual['mb_s'] < datos['mb_s'] * (1 - tolerancia):
+            regresiones.append(f"etapa {nombre}: {actual['mb_s']} MB/s (base {datos['mb_s']} MB/s)")
+
+    for clave in ('p50', 'p99'):
+        actual = resultado['latencia_ms'][clave]
+        referencia = base['latencia_ms'][clave]
+        if actual > referencia * (1 + tolerancia):
+            regresiones.append(f"latencia {clave}: {actual} ms (base {referencia} ms)")
+
+    if 'memoria_mb' in base and resultado.get('memoria_mb', 0) > base['memoria_mb'] * (1 + tolerancia):
+        regresiones.append(f"memoria: {resultado['memoria_mb']} MB (base {base['memoria_mb']} MB)")
+
+    return regresiones
+
+def mostrar_resultado(resultado):
+    """Imprime el resultado en forma de tabla"""
+    print(f"\nDocumentos: {resultado['documentos']}, "
+          f"{resultado['bytes'] / 1e6:.2f} MB, {resultado['tokens']} tokens")
+    print("-" * 68)
+    print(f"{'ETAPA':<16} {'SEGUNDOS':>10} {'MB/s':>12} {'TOKENS/s':>16} {'OMITIDA':>8}")
+    print("-" * 68)
+    for nombre, datos in list(resultado['etapas'].items()) + [('TOTAL', resultado['total'])]:
+        omitida = datos.get('omitida', '')
+        print(f"{nombre:<16} {datos['segundos']:>10.3f} {datos['mb_s']:>12.2f} {datos['tokens_s']:>16.0f} {omitida:>8}")
+    print("-" * 68)
+    print(f"Latencia por documento: p50 {resultado['latencia_ms']['p50']:.2f} ms, "
+          f"p99 {resultado['latencia_ms']['p99']:.2f} ms")
+    if 'memoria_mb' in resultado:
+        print(f"Pico de memoria: {resultado['memoria_mb']:.2f} MB")
+    if resultado.get('compresion'):
+        print("-" * 68)
+        print(f"{'FORMATO':<10} {'MB DISCO':>10} {'B/DOC':>10} {'RATIO':>8} {'ESCRITURA MB/s':>14} {'LECTURA MB/s':>12}")
+        print("-" * 68)
+        for formato, datos in resultado['compresion'].items():
+            print(f"{formato:<10} {datos['bytes_disco'] / 1e6:>10.3f} {datos['bytes_documento']:>10.1f} "
+                  f"{datos['ratio']:>8.3f} {datos['escritura_mb_s']:>14.2f} {datos['lectura_mb_s']:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento del corrector")
+    parser.add_argument('--documentos', type=int, default=200, help="Número de documentos del corpus")
+    parser.add_argument('--palabras', type=int, default=300, help="Palabras medias por documento")
+    parser.add_argument('--tasa-errores', type=float, default=0.05)
+    parser.add_argument('--tasa-fechas', type=float, default=0.01)
+    parser.add_argument('--tasa-numeros', type=float, default=0.03)
+    parser.add_argument('--tasa-romanos', type=float, default=0.005)
+    parser.add_argument('--tasa-abreviaturas', type=float, default=0.01)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--lexico', metavar='RUTA', help="Léxico compilado a usar como diccionario")
+    parser.add_argument('--motor', choices=TextCorrector.SPELLING_ENGINES, default='difflib',
+                        help="Motor para ordenar los candidatos de corrección ortográfica")
+    parser.add_argument('--nivel-trigramas', type=int, metavar='N',
+                        help="Activa la búsqueda por trigramas desde el nivel de distancia N")
+    parser.add_argument('--sin-cambios', action='store_true', help="Desactiva el registro de cambios")
+    parser.add_argument('--etapas', metavar='ETAPAS',
+                        help="Perfil o lista de etapas separadas por comas (por defecto, todas)")
+    parser.add_argument('--sin-prefiltro', action='store_true',
+                        help="Ejecuta todas las etapas sin el prefiltrado")
+    parser.add_argument('--sin-memoria', action='store_true', help="No medir el pico de memoria")
+    parser.add_argument('--compresion', metavar='FORMATOS',
+                        help="Formatos separados por comas (none, gz, bz2, xz, zst) cuya E/S medir")
+    parser.add_argument('--json', metavar='RUTA', help="Guarda el resultado completo en JSON")
+    parser.add_argument('--guardar-base', metavar='RUTA', help="Guarda el resultado como línea base")
+    parser.add_argument('--comparar', metavar='RUTA', help="Compara con una línea base y falla si hay regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Empeoramiento admitido respecto a la base (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    etapas = None
+    if args.etapas:
+        etapas = args.etapas if args.etapas in TextCorrector.PROFILES else args.etapas.split(',')
+    corrector = TextCorrector(lexicon_path=args.lexico, spelling_engine=args.motor, stages=etapas,
+                              prescan=not args.sin_prefiltro, trigram_tier=args.nivel_trigramas)
+    construccion = time.perf_counter() - inicio
+
+    corpus = generar_corpus(corrector, args.documentos, args.palabras, args.tasa_errores, args.tasa_fechas,
+                            args.tasa_numeros, args.tasa_romanos, args.tasa_abreviaturas, args.semilla)
+
+    track_changes = not args.sin_cambios
+    resultado = medir(corrector, corpus, track_changes)
+    resultado['construccion_s'] = round(construccion, 4)
+    if not args.sin_memoria:
+        resultado['memoria_mb'] = medir_memoria(corrector, corpus, track_changes)
+    if args.compresion:
+        resultado['compresion'] = medir_compresion(corpus, [formato.strip() for formato in args.compresion.split(',')
+                                                            if formato.strip()])
+    resultado['parametros'] = {clave: valor for clave, valor in vars(args).items()
+                               if clave not in ('json', 'guardar_base', 'comparar')}
+
+    mostrar_resultado(resultado)
+
+    for ruta in (args.json, args.guardar_base):
+        if ruta:
+            with open(ruta, 'w', encoding='utf-8') as file:
+                json.dump(resultado, file, ensure_ascii=False, indent=2)
+            print(f"Resultado guardado en: {ruta}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as file:
+            base = json.load(file)
+        regresiones = comparar(resultado, base, args.tolerancia)
+        if regresiones:
+            print("\nRegresiones respecto a la línea base:")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+            return 1
+        print("\nSin regresiones respecto a la línea base.")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
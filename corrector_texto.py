@@ -1,12 +1,1761 @@
 import re
 import string
-from datetime import datetime
-from difflib import get_close_matches, ndiff
+from array import array
+from collections import Counter, OrderedDict, deque, namedtuple
+from functools import lru_cache
+from itertools import accumulate, chain
+import argparse
+import glob
+import hashlib
+import heapq
+import io
+import json
+import mmap
 import os
+import pickle
+import struct
 import sys
+import threading
+import time
 
-class TextCorrector:
+# Los módulos pesados (difflib, datetime, asyncio, multiprocessing, NumPy y
+# los de compresión) se importan al usarlos para que el arranque en frío sea
+# rápido.
+
+# NumPy es opcional: solo lo necesita el motor de ortografía 'numpy'
+np = None
+
+def _require_numpy():
+    """Importa NumPy la primera vez que se necesita"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("El motor de ortografía 'numpy' necesita NumPy instalado") from None
+        np = numpy
+    return np
+
+# Formatos de compresión de los archivos de texto, por extensión
+COMPRESSION_FORMATS = {'.gz': 'gz', '.bz2': 'bz2', '.xz': 'xz', '.lzma': 'xz', '.zst': 'zst'}
+
+# Tamaño del búfer de lectura y escritura de los archivos de texto
+IO_BUFFER_SIZE = 1024 * 1024
+
+def compression_format(path, compression=None):
+    """
+    Formato de compresión de un archivo: el indicado ('gz', 'bz2', 'xz',
+    'zst' o 'none') o, si no se indica, el que corresponde a su extensión.
+    """
+    if compression is not None:
+        return None if compression == 'none' else compression
+    return COMPRESSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+def _open_zstd(path, mode):
+    """Abre un archivo zstd con el módulo de la biblioteca estándar o con zstandard"""
+    try:
+        from compression import zstd
+        return zstd.open(path, mode)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Los archivos .zst necesitan el paquete zstandard instalado") from None
+    raw = open(path, mode)
+    if 'r' in mode:
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_size=IO_BUFFER_SIZE, closefd=True)
+    return zstandard.ZstdCompressor().stream_writer(raw, write_size=IO_BUFFER_SIZE, closefd=True)
+
+def open_text(path, mode='r', compression=None, buffer_size=IO_BUFFER_SIZE):
+    """
+    Abre un archivo de texto UTF-8 para leer ('r') o escribir ('w'),
+    descomprimiendo o comprimiendo al vuelo según `compression_format`.
+    Los datos pasan por un búfer grande y nunca se escribe una copia
+    descomprimida en disco. Los saltos de línea se tratan como en open().
+    """
+    fmt = compression_format(path, compression)
+    if fmt is None:
+        return open(path, mode, encoding='utf-8', buffering=buffer_size)
+    
+    binary_mode = mode[0] + 'b'
+    if fmt == 'gz':
+        import gzip
+        # Nivel 6: casi la misma compresión que 9 en bastante menos tiempo
+        raw = gzip.open(path, binary_mode, compresslevel=6)
+    elif fmt == 'bz2':
+        import bz2
+        raw = bz2.open(path, binary_mode)
+    elif fmt == 'xz':
+        import lzma
+        raw = lzma.open(path, binary_mode)
+    elif fmt == 'zst':
+        raw = _open_zstd(path, binary_mode)
+    else:
+        raise ValueError(f"Formato de compresión desconocido: {fmt}")
+    
+    buffered = io.BufferedReader(raw, buffer_size) if mode[0] == 'r' else io.BufferedWriter(raw, buffer_size)
+    return io.TextIOWrapper(buffered, encoding='utf-8')
+
+# Tokens del texto: palabras, bloques de espacios o signos sueltos
+TOKEN_PATTERN = re.compile(r'\w+|\s+|[^\w\s]')
+
+# Números romanos en mayúsculas
+ROMAN_PATTERN = re.compile(r'[IVXLCDM]+')
+
+# Caracteres a conservar (alfanuméricos, puntuación básica, espacios)
+VALID_CHARS = frozenset(string.ascii_letters + string.digits + "áéíóúÁÉÍÓÚüÜñÑ.,;:¿?¡!()[]-_/\"' \n")
+
+# Resultado de una corrección: texto corregido, registro de cambios (None
+# si el registro está desactivado) y, con plazo, si la corrección quedó
+# completa y qué palabras fuera del diccionario no llegaron a revisarse
+CorrectionResult = namedtuple('CorrectionResult', ['text', 'changes', 'complete', 'unchecked'],
+                              defaults=(True, ()))
+
+class _Budget:
+    """Plazo de una corrección (instante de time.monotonic) y palabras que quedaron sin revisar"""
+    __slots__ = ('deadline', 'unchecked')
+    
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.unchecked = []
+    
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+class Change:
+    """
+    Un cambio registrado: posiciones [start, end) en el texto original,
+    etapa, tipo y texto de reemplazo. Admite el acceso tipo diccionario
+    (change['tipo'], change['original'], change['corrected']).
+    """
+    __slots__ = ('start', 'end', 'stage', 'tipo', 'original', 'corrected')
+    
+    def __init__(self, start, end, stage, tipo, original, corrected):
+        self.start = start
+        self.end = end
+        self.stage = stage
+        self.tipo = tipo
+        self.original = original
+        self.corrected = corrected
+    
+    def __getitem__(self, key):
+        return getattr(self, key)
+    
+    def __repr__(self):
+        return f"Change({self.start}, {self.end}, {self.stage!r}, {self.tipo!r}, {self.original!r}, {self.corrected!r})"
+
+class ChangeLog:
+    """
+    Registro compacto de los cambios de una corrección. Cada cambio ocupa
+    una posición en arreglos paralelos (inicio, fin, etapa, tipo) más su
+    texto de reemplazo; el fragmento original se obtiene del texto de
+    entrada solo cuando se pide y el texto de cada etapa se reconstruye
+    también bajo demanda.
+    """
+    __slots__ = ('text', 'token_starts', 'starts', 'ends', 'stages', 'kinds', 'replacements', 'stage', 'order')
+    
+    # Etapas y tipos de cambio se guardan como códigos pequeños. Las tablas
+    # las comparten todos los registros y solo crecen, bajo _codes_lock
+    STAGE_NAMES = []
+    KIND_NAMES = []
+    _stage_codes = {}
+    _kind_codes = {}
+    _codes_lock = threading.Lock()
+    
+    def __init__(self, text, tokens):
+        self.text = text
+        # Posición en el texto original del inicio de cada token (y del final)
+        self.token_starts = array('q', accumulate(map(len, tokens), initial=0))
+        self.starts = array('q')
+        self.ends = array('q')
+        self.stages = array('B')
+        self.kinds = array('B')
+        self.replacements = []
+        self.stage = 0
+        # Etapas ejecutadas, en orden
+        self.order = []
+    
+    @staticmethod
+    def _code(names, codes, name):
+        code = codes.get(name)
+        if code is None:
+            with ChangeLog._codes_lock:
+                code = codes.get(name)
+                if code is None:
+                    # El nombre se añade antes de publicar su código
+                    names.append(name)
+                    code = codes[name] = len(names) - 1
+        return code
+    
+    def begin_stage(self, name):
+        """Indica la etapa a la que pertenecen los siguientes cambios"""
+        self.stage = self._code(self.STAGE_NAMES, self._stage_codes, name)
+        self.order.append(self.stage)
+    
+    def add(self, first, last, tipo, replacement):
+        """Registra que los tokens [first, last) se sustituyen por `replacement`"""
+        self.starts.append(self.token_starts[first])
+        self.ends.append(self.token_starts[last])
+        self.stages.append(self.stage)
+        self.kinds.append(self._code(self.KIND_NAMES, self._kind_codes, tipo))
+        self.replacements.append(replacement)
+    
+    def retokenize(self, sources):
+        """
+        Actualiza las posiciones de los tokens cuando una etapa vuelve a
+        tokenizar el texto. `sources` indica, para cada token nuevo, el token
+        antiguo en cuya posición empieza; los límites de los tokens nuevos
+        coinciden con límites de los antiguos.
+        """
+        starts = array('q', (self.token_starts[index] for index in sources))
+        starts.append(self.token_starts[-1])
+        self.token_starts = starts
+    
+    def __len__(self):
+        return len(self.replacements)
+    
+    def spans(self):
+        """Los cambios como tuplas (inicio, fin, etapa, tipo, reemplazo)"""
+        return [(self.starts[index], self.ends[index], self.STAGE_NAMES[self.stages[index]],
+                 self.KIND_NAMES[self.kinds[index]], self.replacements[index])
+                for index in range(len(self.replacements))]
+    
+    def extend_spans(self, stages, parts):
+        """
+        Reconstruye el registro a partir de los spans de varios fragmentos
+        consecutivos del texto, dados como (desplazamiento, spans). Los cambios
+        quedan ordenados por etapa y, dentro de cada etapa, por fragmento,
+        igual que si el texto se hubiera corregido de una vez.
+        """
+        for name in stages:
+            self.begin_stage(name)
+        for name in dict.fromkeys(stages):
+            stage = self._stage_codes[name]
+            for offset, spans in parts:
+                for start, end, span_stage, tipo, replacement in spans:
+                    if span_stage == name:
+                        self.starts.append(start + offset)
+                        self.ends.append(end + offset)
+                        self.stages.append(stage)
+                        self.kinds.append(self._code(self.KIND_NAMES, self._kind_codes, tipo))
+                        self.replacements.append(replacement)
+    
+    def count_kinds(self, first=0, stage=None):
+        """Número de cambios por tipo desde la posición `first` (y de una etapa)"""
+        code = self._stage_codes.get(stage) if stage is not None else None
+        counts = {}
+        if stage is not None and code is None:
+            return counts
+        for index in range(first, len(self.replacements)):
+            if code is None or self.stages[index] == code:
+                tipo = self.KIND_NAMES[self.kinds[index]]
+                counts[tipo] = counts.get(tipo, 0) + 1
+        return counts
+    
+    def __getitem__(self, index):
+        start = self.starts[index]
+        end = self.ends[index]
+        return Change(start, end, self.STAGE_NAMES[self.stages[index]], self.KIND_NAMES[self.kinds[index]],
+                      self.text[start:end], self.replacements[index])
+    
+    def __iter__(self):
+        for index in range(len(self.replacements)):
+            yield self[index]
+    
+    def corrected_text(self, stage=None):
+        """
+        Reconstruye el texto aplicando los cambios registrados, todos o solo
+        los de las etapas hasta `stage` (incluida), en el orden de registro.
+        """
+        if stage is None:
+            selected = range(len(self.replacements))
+        else:
+            limit = self._stage_codes.get(stage)
+            if limit not in self.order:
+                raise ValueError(f"Etapa no ejecutada: {stage}")
+            allowed = set(self.order[:self.order.index(limit) + 1])
+            selected = [index for index in range(len(self.replacements)) if self.stages[index] in allowed]
+        
+        pieces = []
+        cursor = 0
+        for index in self.effective(selected):
+            start = self.starts[index]
+            pieces.append(self.text[cursor:start])
+            pieces.append(self.replacements[index])
+            cursor = self.ends[index]
+        pieces.append(self.text[cursor:])
+        
+        return ''.join(pieces)
+    
+    def effective(self, selected=None):
+        """
+        Índices de los cambios que llegan al texto final, en orden de
+        posición: un cambio posterior sustituye a los anteriores que abarca.
+        """
+        if selected is None:
+            selected = range(len(self.replacements))
+        ordered = sorted(selected, key=lambda index: (self.starts[index], -self.ends[index], -index))
+        cursor = 0
+        for index in ordered:
+            if self.starts[index] < cursor:
+                continue
+            yield index
+            cursor = self.ends[index]
+
+def _is_word_char(char):
+    """Indica si el carácter forma parte de una palabra (equivalente a \\w)"""
+    return char.isalnum() or char == '_'
+
+def _strip_invalid(token):
+    """El token sin los caracteres que quita la etapa de caracteres especiales"""
+    if token.isspace() or (token.isascii() and token.isalnum()):
+        return token
+    return ''.join(char for char in token if char in VALID_CHARS)
+
+class SymmetricDeleteIndex:
+    """
+    Índice de borrados simétricos (estilo SymSpell) para obtener candidatos
+    de corrección sin comparar contra todo el diccionario.
+    Cada palabra se indexa por todas las variantes que resultan de borrar
+    hasta `max_edit_distance` caracteres de su prefijo.
+    """
+    def __init__(self, words, max_edit_distance=3, prefix_length=7):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.deletes = {}
+        
+        for word in words:
+            self.add(word)
+    
+    def _generate_deletes(self, word):
+        """Genera las variantes por borrado del prefijo de la palabra"""
+        if self.prefix_length:
+            word = word[:self.prefix_length]
+        
+        variants = {word}
+        frontier = [word]
+        for _ in range(self.max_edit_distance):
+            next_frontier = []
+            for variant in frontier:
+                for i in range(len(variant)):
+                    deleted = variant[:i] + variant[i + 1:]
+                    if deleted not in variants:
+                        variants.add(deleted)
+                        next_frontier.append(deleted)
+            frontier = next_frontier
+        
+        return variants
+    
+    def add(self, word):
+        """Añade una palabra al índice"""
+        for variant in self._generate_deletes(word):
+            self.deletes.setdefault(variant, []).append(word)
+    
+    def candidates(self, word):
+        """Devuelve las palabras del diccionario que comparten algún borrado con `word`"""
+        found = set()
+        for variant in self._generate_deletes(word):
+            words = self.deletes.get(variant)
+            if words:
+                found.update(words)
+        return found
+    
+    def lookup(self, word, cutoff=0.7):
+        """
+        Devuelve la mejor sugerencia para `word` o None.
+        La puntuación es la misma que la de get_close_matches, pero solo
+        sobre los candidatos del índice.
+        """
+        from difflib import get_close_matches
+        matches = get_close_matches(word, self.candidates(word), n=1, cutoff=cutoff)
+        return matches[0] if matches else None
+
+class TrigramIndex:
+    """
+    Índice invertido de n-gramas de caracteres (trigramas por defecto) para
+    palabras muy deformadas, que quedan fuera del alcance del índice de
+    borrados. Los n-gramas se toman de la clave sin tildes ni letras
+    repetidas, y los candidatos, de longitud parecida, se ordenan por la
+    fracción de los n-gramas de la palabra más corta que comparten; así
+    "mmeexxiiccoo" llega a "méxico" y "aosprrtetsyivo", con letras
+    intercaladas, a "opresivo":
+    
+    >>> index = TrigramIndex(['méxico', 'opresivo', 'martes'])
+    >>> index.candidates('mmeexxiiccoo')
+    ['méxico']
+    >>> index.candidates('aosprrtetsyivo')
+    ['opresivo']
+    >>> index.lookup('aosprrtetsyivo')
+    'opresivo'
+    """
+    def __init__(self, words, n=3):
+        self.n = n
+        self.words = []
+        # Número de n-gramas distintos de cada palabra
+        self.sizes = array('H')
+        self.postings = {}
+        
+        for word in words:
+            self.add(word)
+    
+    def _grams(self, word):
+        """N-gramas distintos de la clave sin tildes ni repeticiones, con marcas de inicio y fin"""
+        padded = f"\x02{collapse_repeats(word)}\x03"
+        return {padded[i:i + self.n] for i in range(max(1, len(padded) - self.n + 1))}
+    
+    def add(self, word):
+        """Añade una palabra al índice"""
+        grams = self._grams(word)
+        index = len(self.words)
+        self.words.append(word)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(index)
+    
+    def candidates(self, word, limit=10, min_similarity=0.25):
+        """
+        Hasta `limit` palabras que comparten n-gramas con `word`, de longitud
+        parecida (a lo sumo la mitad de diferencia) y que comparten al menos
+        la fracción `min_similarity` de los n-gramas de la más corta de las
+        dos, de más a menos parecidas.
+        """
+        grams = self._grams(word)
+        overlaps = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in grams))
+        
+        length = len(word)
+        slack = max(2, length // 2)
+        scored = []
+        for index, overlap in overlaps.items():
+            candidate = self.words[index]
+            if abs(len(candidate) - length) > slack:
+                continue
+            score = overlap / min(len(grams), self.sizes[index])
+            if score >= min_similarity:
+                scored.append((score, -abs(len(candidate) - length), candidate))
+        
+        return [candidate for _, _, candidate in heapq.nlargest(limit, scored)]
+    
+    def lookup(self, word, min_similarity=0.25, cutoff=0.6):
+        """
+        Mejor sugerencia para `word` entre sus candidatos por n-gramas (ver
+        candidates()), o None. La comparación fina también se hace sin tildes ni repeticiones
+        y admite más diferencia que la del índice de borrados.
+        """
+        from difflib import get_close_matches
+        keys = {}
+        for candidate in self.candidates(word, min_similarity=min_similarity):
+            keys.setdefault(collapse_repeats(candidate), candidate)
+        matches = get_close_matches(collapse_repeats(word), keys, n=1, cutoff=cutoff)
+        return keys[matches[0]] if matches else None
+
+class EditDistanceScorer:
+    """
+    Distancia de edición acotada (Levenshtein, o Damerau con transposición
+    de letras contiguas) calculada con NumPy para muchos pares a la vez.
+    El léxico se guarda agrupado por longitud en matrices de enteros (un
+    código Unicode por carácter) y, fila a fila del cálculo, se descartan
+    los pares que ya superan su cota.
+    """
+    def __init__(self, words, transpositions=True):
+        _require_numpy()
+        self.transpositions = transpositions
+        
+        by_length = {}
+        for word in words:
+            by_length.setdefault(len(word), []).append(word)
+        
+        # Por longitud: matriz (palabras x caracteres) y posición de cada palabra
+        self.buckets = {}
+        self.slots = {}
+        for length, group in by_length.items():
+            if not length:
+                continue
+            self.buckets[length] = self._encode(''.join(group)).reshape(len(group), length)
+            for row, word in enumerate(group):
+                self.slots[word] = row
+    
+    def __setstate__(self, state):
+        _require_numpy()
+        self.__dict__.update(state)
+    
+    @staticmethod
+    def _encode(text):
+        return np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.int32)
+    
+    def distances(self, queries, query_lengths, candidates, candidate_lengths, bounds):
+        """
+        Distancias entre cada fila de `queries` (rellenas con -1) y la fila
+        correspondiente de `candidates` (rellenas con -2). Las columnas de
+        relleno quedan a la derecha y no influyen en las reales. Un par cuya
+        distancia supera su cota devuelve cota + 1.
+        """
+        count, length = candidates.shape
+        result = bounds + 1
+        columns = np.arange(length + 1)
+        previous = np.tile(columns, (count, 1))
+        before_previous = None
+        active = np.arange(count)
+        
+        for i in range(1, int(query_lengths.max()) + 1):
+            char = queries[:, i - 1:i]
+            row = np.empty_like(previous)
+            row[:, 0] = i
+            row[:, 1:] = np.minimum(previous[:, :-1] + (candidates != char), previous[:, 1:] + 1)
+            if self.transpositions and i > 1 and length > 1:
+                swapped = (char == candidates[:, :-1]) & (queries[:, i - 2:i - 1] == candidates[:, 1:])
+                row[:, 2:] = np.where(swapped, np.minimum(row[:, 2:], before_previous[:, :-2] + 1), row[:, 2:])
+            # Inserciones: D[i][j] = min(D[i][j], D[i][j-1] + 1) de una vez
+            row = np.minimum.accumulate(row - columns, axis=1) + columns
+            
+            finished = query_lengths == i
+            if finished.any():
+                values = row[finished, candidate_lengths[finished]]
+                result[active[finished]] = np.minimum(values, bounds[finished] + 1)
+            
+            # El mínimo de la fila no decrece: si supera la cota, el par queda fuera
+            keep = ~finished & (row.min(axis=1) <= bounds)
+            if not keep.any():
+                break
+            if not keep.all():
+                queries = queries[keep]
+                query_lengths = query_lengths[keep]
+                candidates = candidates[keep]
+                candidate_lengths = candidate_lengths[keep]
+                bounds = bounds[keep]
+                active = active[keep]
+                row = row[keep]
+                previous = previous[keep]
+            before_previous, previous = previous, row
+        
+        return result
+    
+    def best_many(self, queries, candidate_sets, bounds):
+        """
+        Para cada consulta, el candidato más cercano dentro de su cota (o
+        None). A igual distancia gana el de longitud más parecida y después
+        el primero en orden alfabético. Todos los pares se calculan juntos.
+        """
+        lengths = [len(query) for query in queries]
+        
+        # Pares (consulta, candidato) por longitud del candidato, descartando
+        # los que ya difieren en longitud más que la cota
+        groups = {}
+        pair_queries = []
+        pair_words = []
+        for index, candidates in enumerate(candidate_sets):
+            for word in candidates:
+                length = len(word)
+                if abs(length - lengths[index]) <= bounds[index] and word in self.slots:
+                    groups.setdefault(length, []).append(len(pair_words))
+                    pair_queries.append(index)
+                    pair_words.append(word)
+        
+        best = [None] * len(queries)
+        if not pair_words:
+            return best
+        
+        # Matrices de la consulta y del candidato de cada par, con relleno
+        encoded = np.full((len(queries), max(lengths)), -1, dtype=np.int32)
+        for index, query in enumerate(queries):
+            encoded[index, :lengths[index]] = self._encode(query)
+        candidates = np.full((len(pair_words), max(groups)), -2, dtype=np.int32)
+        candidate_lengths = np.empty(len(pair_words), dtype=np.intp)
+        for length, pairs in groups.items():
+            candidates[pairs, :length] = self.buckets[length][[self.slots[pair_words[k]] for k in pairs]]
+            candidate_lengths[pairs] = length
+        
+        pair_queries = np.array(pair_queries)
+        pair_bounds = np.array(bounds, dtype=np.int32)[pair_queries]
+        found = self.distances(encoded[pair_queries], np.array(lengths, dtype=np.int32)[pair_queries],
+                               candidates, candidate_lengths, pair_bounds)
+        
+        for k in np.flatnonzero(found <= pair_bounds):
+            index = pair_queries[k]
+            key = (int(found[k]), abs(int(candidate_lengths[k]) - lengths[index]), pair_words[k])
+            if best[index] is None or key < best[index]:
+                best[index] = key
+        
+        return [key[2] if key else None for key in best]
+
+# Cabecera del artefacto precompilado del corrector: firma y versión
+ARTIFACT_MAGIC = b'TCOR'
+ARTIFACT_VERSION = 8
+ARTIFACT_HEADER = struct.Struct('<4sI')
+
+# Cabecera del formato compacto de léxico: firma, versión, número de palabras,
+# huella de las palabras y parámetros del índice de borrados compilado
+LEXICON_MAGIC = b'LEXC'
+LEXICON_VERSION = 2
+LEXICON_HEADER = struct.Struct('<4sII20sII')
+
+# Tablas compiladas tras las palabras, en este orden: índice de borrados y
+# claves normalizadas (las de NormalizedIndex.KEYS). Cada una empieza con el
+# número de claves y de posiciones
+LEXICON_TABLES = ('deletes', 'accents', 'repeats', 'phonetic')
+LEXICON_TABLE_HEADER = struct.Struct('<II')
+
+def _write_uint32(file, values):
+    """Escribe enteros uint32 en little endian"""
+    values = array('I', values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    file.write(values.tobytes())
+
+def _write_padded(file, data):
+    """Escribe un bloque de bytes rellenando hasta múltiplo de 4"""
+    file.write(data)
+    file.write(b'\0' * (-len(data) % 4))
+
+def _write_table(file, table):
+    """Escribe una tabla clave -> índices de palabras con las claves ordenadas byte a byte"""
+    entries = sorted((key.encode('utf-8'), postings) for key, postings in table.items())
+    file.write(LEXICON_TABLE_HEADER.pack(len(entries), sum(len(postings) for _, postings in entries)))
+    _write_uint32(file, accumulate((len(key) for key, _ in entries), initial=0))
+    _write_uint32(file, accumulate((len(postings) for _, postings in entries), initial=0))
+    _write_uint32(file, chain.from_iterable(postings for _, postings in entries))
+    _write_padded(file, b''.join(key for key, _ in entries))
+
+def compile_lexicon(words, path, max_edit_distance=3, prefix_length=7):
+    """
+    Compila una lista de palabras a un archivo de léxico compacto.
+    El formato es una cabecera, un arreglo de desplazamientos (uint32), un
+    bloque con las palabras en UTF-8 ordenadas byte a byte y, a
+    continuación, el índice de borrados (para `max_edit_distance` y
+    `prefix_length`) y las tablas de claves normalizadas, de modo que los
+    procesos que abren el léxico no tienen que construirlos en memoria.
+    Devuelve el número de palabras escritas.
+    """
+    encoded = sorted({word.strip().lower().encode('utf-8') for word in words if word.strip()})
+    words = [word.decode('utf-8') for word in encoded]
+    positions = {word: index for index, word in enumerate(words)}
+    
+    # Misma huella que dictionary_fingerprint() sobre un conjunto con estas palabras
+    digest = hashlib.sha1()
+    for word in encoded:
+        digest.update(word)
+        digest.update(b'\n')
+    
+    tables = {'deletes': {key: [positions[word] for word in group] for key, group
+                          in SymmetricDeleteIndex(words, max_edit_distance, prefix_length).deletes.items()}}
+    for name, table in NormalizedIndex(words).tables.items():
+        tables[name] = {key: [positions[found]] if isinstance(found, str) else [positions[word] for word in found]
+                        for key, found in table.items()}
+    
+    with open(path, 'wb') as file:
+        file.write(LEXICON_HEADER.pack(LEXICON_MAGIC, LEXICON_VERSION, len(encoded), digest.digest(),
+                                       max_edit_distance, prefix_length))
+        _write_uint32(file, accumulate(map(len, encoded), initial=0))
+        _write_padded(file, b''.join(encoded))
+        for name in LEXICON_TABLES:
+            _write_table(file, tables[name])
+    
+    return len(encoded)
+
+def _uint32_view(buffer, start, count):
+    """
+    Los `count` enteros uint32 que empiezan en `start` y la posición
+    siguiente. En little endian se leen sobre el búfer, sin copiarlos.
+    """
+    end = start + 4 * count
+    if sys.byteorder == 'little':
+        return memoryview(buffer)[start:end].cast('I'), end
+    values = array('I', buffer[start:end])
+    values.byteswap()
+    return values, end
+
+class _SortedKeys:
+    """Bloque de claves UTF-8 ordenadas dentro de un búfer, con búsqueda binaria"""
+    def _key_bytes(self, index):
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return self._mmap[start:end]
+    
+    def _lower_bound(self, key):
+        """Primer índice cuya clave es >= key (búsqueda binaria)"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def _find(self, key):
+        """Índice de la clave `key` (bytes), o -1 si no está"""
+        index = self._lower_bound(key)
+        if index < self._count and self._key_bytes(index) == key:
+            return index
+        return -1
+
+class MappedLexicon(_SortedKeys):
+    """
+    Léxico de solo lectura abierto con mmap desde un archivo compilado con
+    compile_lexicon. Las búsquedas, también las del índice de borrados y las
+    de claves normalizadas, se hacen directamente sobre el búfer mapeado,
+    por lo que varios procesos comparten las mismas páginas.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version = struct.unpack_from('<4sI', self._mmap, 0)
+        if magic != LEXICON_MAGIC or version != LEXICON_VERSION:
+            self._mmap.close()
+            raise ValueError(f"Formato de léxico no válido (vuelva a compilarlo): {path}")
+        
+        _, _, count, self._digest, self.max_edit_distance, self.prefix_length = \
+            LEXICON_HEADER.unpack_from(self._mmap, 0)
+        self._count = count
+        self._offsets, self._blob_start = _uint32_view(self._mmap, LEXICON_HEADER.size, count + 1)
+        # Vistas sobre el mapeo, que hay que liberar antes de cerrarlo
+        self._views = [self._offsets]
+        
+        # Posición de cada tabla compilada; se abren al pedirlas
+        position = self._blob_start + self._offsets[count]
+        position += -position % 4
+        self._table_positions = {}
+        for name in LEXICON_TABLES:
+            self._table_positions[name] = position
+            keys, postings = LEXICON_TABLE_HEADER.unpack_from(self._mmap, position)
+            key_bytes = struct.unpack_from('<I', self._mmap, position + LEXICON_TABLE_HEADER.size + 4 * keys)[0]
+            position += LEXICON_TABLE_HEADER.size + 4 * (2 * (keys + 1) + postings) + key_bytes
+            position += -position % 4
+        self._tables = {}
+    
+    def __reduce__(self):
+        # El mapeo no se serializa: se vuelve a abrir el archivo
+        return (MappedLexicon, (self.path,))
+    
+    def close(self):
+        """Libera el mapeo del archivo"""
+        for view in self._views:
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+    
+    def word(self, index):
+        """Palabra en la posición `index` del léxico"""
+        return self._key_bytes(index).decode('utf-8')
+    
+    def table(self, name):
+        """Tabla compilada `name` (ver LEXICON_TABLES)"""
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = _MappedTable(self, name)
+        return table
+    
+    def delete_index(self, max_edit_distance, prefix_length=7):
+        """
+        Índice de borrados compilado en el léxico, o None si se compiló con
+        otra distancia máxima o longitud de prefijo.
+        """
+        if (max_edit_distance, prefix_length) != (self.max_edit_distance, self.prefix_length):
+            return None
+        return MappedDeleteIndex(self.table('deletes'), max_edit_distance, prefix_length)
+    
+    def normalized_index(self):
+        """Índice de claves normalizadas compilado en el léxico"""
+        return MappedNormalizedIndex({name: self.table(name) for name, _ in NormalizedIndex.KEYS})
+    
+    def __len__(self):
+        return self._count
+    
+    def __contains__(self, word):
+        return self._find(word.encode('utf-8')) >= 0
+    
+    def __iter__(self):
+        for index in range(self._count):
+            yield self.word(index)
+    
+    def iter_prefix(self, prefix):
+        """Itera en orden las palabras que empiezan por `prefix`"""
+        key = prefix.encode('utf-8')
+        for index in range(self._lower_bound(key), self._count):
+            word = self._key_bytes(index)
+            if not word.startswith(key):
+                break
+            yield word.decode('utf-8')
+    
+    def fingerprint(self):
+        """Huella del contenido del léxico (la de dictionary_fingerprint sobre sus palabras)"""
+        return self._digest.hex()
+
+class _MappedTable(_SortedKeys):
+    """
+    Tabla compilada de un léxico mapeado: claves ordenadas y, por clave, las
+    posiciones de sus palabras. Se consulta sobre el mapeo como un
+    diccionario de solo lectura clave -> tupla de palabras.
+    """
+    def __init__(self, lexicon, name):
+        self.lexicon = lexicon
+        self.name = name
+        self._mmap = lexicon._mmap
+        position = lexicon._table_positions[name]
+        self._count, postings = LEXICON_TABLE_HEADER.unpack_from(self._mmap, position)
+        self._offsets, position = _uint32_view(self._mmap, position + LEXICON_TABLE_HEADER.size, self._count + 1)
+        self._posting_offsets, position = _uint32_view(self._mmap, position, self._count + 1)
+        self._postings, self._blob_start = _uint32_view(self._mmap, position, postings)
+        lexicon._views.extend((self._offsets, self._posting_offsets, self._postings))
+    
+    def __reduce__(self):
+        return (_MappedTable, (self.lexicon, self.name))
+    
+    def __len__(self):
+        return self._count
+    
+    def __contains__(self, key):
+        return self._find(key.encode('utf-8')) >= 0
+    
+    def get(self, key, default=None):
+        index = self._find(key.encode('utf-8'))
+        if index < 0:
+            return default
+        word = self.lexicon.word
+        return tuple(word(self._postings[k])
+                     for k in range(self._posting_offsets[index], self._posting_offsets[index + 1]))
+
+class MappedDeleteIndex(SymmetricDeleteIndex):
+    """Índice de borrados compilado en un léxico mapeado: se consulta sin cargarlo en memoria"""
+    def __init__(self, table, max_edit_distance=3, prefix_length=7):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.deletes = table
+    
+    def add(self, word):
+        raise TypeError("El índice de borrados de un léxico compilado es de solo lectura")
+
+class WordSet(set):
+    """
+    Conjunto de palabras que cuenta sus modificaciones en `version`, para
+    que el corrector detecte cualquier cambio del diccionario (también los
+    que no alteran su tamaño) sin recorrerlo.
+    """
+    version = 0
+    
+    def add(self, word):
+        self.version += 1
+        super().add(word)
+    
+    def discard(self, word):
+        self.version += 1
+        super().discard(word)
+    
+    def remove(self, word):
+        self.version += 1
+        super().remove(word)
+    
+    def pop(self):
+        self.version += 1
+        return super().pop()
+    
+    def clear(self):
+        self.version += 1
+        super().clear()
+    
+    def update(self, *others):
+        self.version += 1
+        super().update(*others)
+    
+    def difference_update(self, *others):
+        self.version += 1
+        super().difference_update(*others)
+    
+    def intersection_update(self, *others):
+        self.version += 1
+        super().intersection_update(*others)
+    
+    def symmetric_difference_update(self, other):
+        self.version += 1
+        super().symmetric_difference_update(other)
+    
+    def __ior__(self, other):
+        self.version += 1
+        return super().__ior__(other)
+    
+    def __iand__(self, other):
+        self.version += 1
+        return super().__iand__(other)
+    
+    def __isub__(self, other):
+        self.version += 1
+        return super().__isub__(other)
+    
+    def __ixor__(self, other):
+        self.version += 1
+        return super().__ixor__(other)
+
+def dictionary_fingerprint(dictionary):
+    """Calcula una huella del contenido de un diccionario (set o léxico mapeado)"""
+    if hasattr(dictionary, 'fingerprint'):
+        return dictionary.fingerprint()
+    digest = hashlib.sha1()
+    for word in sorted(dictionary):
+        digest.update(word.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+class CorrectionCache:
+    """
+    Memoria LRU acotada de token en minúsculas -> corrección elegida.
+    También guarda los resultados negativos (None = sin sugerencia).
+    Las entradas están ligadas a la huella del diccionario y se descartan
+    en cuanto esta cambia. Es segura para usarla desde varios hilos.
+    """
+    FORMAT_VERSION = 1
+    MISSING = object()
+    
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def bind(self, fingerprint):
+        """Asocia la caché a un diccionario; si es otro, se vacía"""
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self.entries.clear()
+                self.fingerprint = fingerprint
+    
+    def get(self, key):
+        """Devuelve la corrección guardada o CorrectionCache.MISSING"""
+        with self._lock:
+            value = self.entries.get(key, self.MISSING)
+            if value is self.MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        """Guarda una corrección, expulsando la menos usada si se llena"""
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+    
+    def save(self, path):
+        """Guarda la caché en un archivo JSON local"""
+        with self._lock:
+            data = {
+                'version': self.FORMAT_VERSION,
+                'fingerprint': self.fingerprint,
+                'entries': list(self.entries.items())
+            }
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+    
+    def load(self, path):
+        """
+        Carga entradas guardadas con save(). Se ignoran si pertenecen a otro
+        diccionario. Devuelve el número de entradas cargadas.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        
+        if data.get('version') != self.FORMAT_VERSION or data.get('fingerprint') != self.fingerprint:
+            return 0
+        
+        for key, value in data['entries']:
+            self.put(key, value)
+        return len(data['entries'])
+
+class ParagraphCache:
+    """
+    Caché de resultados por párrafo direccionada por contenido. La clave es
+    el hash del párrafo junto con la huella de la configuración del
+    corrector; el valor, el párrafo corregido y sus cambios con posiciones
+    relativas al párrafo. En memoria es una LRU acotada y, si se indica una
+    ruta, se respalda en una base SQLite local que se conserva entre
+    ejecuciones y que comparten los procesos del modo lote.
+    """
+    def __init__(self, maxsize=10000, path=None, disk_maxsize=1000000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self._disk_rows = 0
+        self._writes = 0
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_db'] = None
+        state['_pid'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(config, paragraph):
+        """Clave de un párrafo para una configuración dada"""
+        return hashlib.sha1(f"{config}\0{paragraph}".encode('utf-8')).digest()
+    
+    def _connection(self):
+        """Conexión a la base en disco, abierta de nuevo en cada proceso (fork)"""
+        if self.path is None:
+            return None
+        if self._db is None or self._pid != os.getpid():
+            import sqlite3
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS paragraphs '
+                             '(key BLOB PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS paragraphs_used ON paragraphs (used)')
+            self._disk_rows = self._db.execute('SELECT COUNT(*) FROM paragraphs').fetchone()[0]
+            self._pid = os.getpid()
+        return self._db
+    
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def get(self, key):
+        """Devuelve (texto corregido, spans) o None si el párrafo no está"""
+        with self._lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return value
+            
+            db = self._connection()
+            if db is not None:
+                row = db.execute('SELECT value FROM paragraphs WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    text, spans = json.loads(row[0])
+                    value = (text, [tuple(span) for span in spans])
+                    db.execute('UPDATE paragraphs SET used = ? WHERE key = ?', (time.time_ns(), key))
+                    self._written(db)
+                    self.hits += 1
+                    self._remember(key, value)
+                    return value
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        """Guarda el resultado de un párrafo"""
+        with self._lock:
+            self._remember(key, value)
+            db = self._connection()
+            if db is not None:
+                db.execute('INSERT OR REPLACE INTO paragraphs (key, value, used) VALUES (?, ?, ?)',
+                           (key, json.dumps(value, ensure_ascii=False), time.time_ns()))
+                self._disk_rows += 1
+                self._written(db)
+    
+    def _written(self, db):
+        """
+        Confirma cada escritura enseguida (otros procesos pueden estar usando
+        la misma base) y, cada cierto número, recorta la base si crece demasiado.
+        """
+        db.commit()
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self._trim(db)
+    
+    def _trim(self, db):
+        """Elimina de la base las entradas usadas hace más tiempo por encima del límite"""
+        if self._disk_rows > self.disk_maxsize:
+            db.execute('DELETE FROM paragraphs WHERE key IN '
+                       '(SELECT key FROM paragraphs ORDER BY used LIMIT ?)',
+                       (self._disk_rows - self.disk_maxsize,))
+            db.commit()
+        self._disk_rows = db.execute('SELECT COUNT(*) FROM paragraphs').fetchone()[0]
+    
+    def flush(self):
+        """Ajusta la base en disco a su tamaño máximo"""
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._trim(self._db)
+    
+    def close(self):
+        """Recorta y cierra la base en disco"""
+        self.flush()
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+    
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class CorrectorMetrics:
+    """
+    Contadores de rendimiento del corrector: tiempo y tokens por etapa,
+    palabras fuera del diccionario, búsquedas aproximadas, aciertos de la
+    caché y reemplazos por tipo de cambio. Cada llamada se acumula de una
+    vez bajo un cerrojo, así que es segura entre hilos.
+    """
     def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        """Pone todos los contadores a cero"""
+        with self._lock:
+            self.calls = 0
+            self.stage_seconds = {}
+            self.stage_tokens = {}
+            self.stage_skipped = {}
+            self.counters = {'oov': 0, 'fuzzy_lookups': 0, 'cache_hits': 0}
+            self.replacements = {}
+    
+    def record_call(self, stages, replacements, calls=1, skipped=()):
+        """
+        Acumula una llamada: `stages` es una lista de (etapa, segundos, tokens),
+        `replacements` un diccionario tipo -> número de cambios y `skipped`
+        las etapas que el prefiltrado no llegó a ejecutar.
+        """
+        with self._lock:
+            self.calls += calls
+            for name, seconds, tokens in stages:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+                self.stage_tokens[name] = self.stage_tokens.get(name, 0) + tokens
+            for name in skipped:
+                self.stage_skipped[name] = self.stage_skipped.get(name, 0) + 1
+            for tipo, count in replacements.items():
+                self.replacements[tipo] = self.replacements.get(tipo, 0) + count
+    
+    def increment(self, **counts):
+        """Suma a los contadores generales, p. ej. increment(oov=3)"""
+        with self._lock:
+            for name, count in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + count
+    
+    def snapshot(self):
+        """Copia de los contadores en un diccionario serializable a JSON"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'stages': {name: {'seconds': round(self.stage_seconds[name], 6),
+                                  'tokens': self.stage_tokens[name]}
+                           for name in self.stage_seconds},
+                'skipped': dict(self.stage_skipped),
+                'counters': dict(self.counters),
+                'replacements': dict(self.replacements)
+            }
+    
+    def merge(self, snapshot):
+        """Suma un snapshot() de otro corrector (por ejemplo de un proceso hijo)"""
+        stages = [(name, data['seconds'], data['tokens']) for name, data in snapshot['stages'].items()]
+        skipped = [name for name, count in snapshot.get('skipped', {}).items() for _ in range(count)]
+        self.record_call(stages, snapshot['replacements'], snapshot['calls'], skipped)
+        self.increment(**snapshot['counters'])
+    
+    @staticmethod
+    def _label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    def to_prometheus(self, prefix='corrector'):
+        """Los contadores en el formato de texto de Prometheus"""
+        data = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_calls_total Textos procesados.",
+            f"# TYPE {prefix}_calls_total counter",
+            f"{prefix}_calls_total {data['calls']}",
+            f"# HELP {prefix}_stage_seconds_total Tiempo acumulado por etapa.",
+            f"# TYPE {prefix}_stage_seconds_total counter"
+        ]
+        for name, stage in data['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{self._label(name)}"}} {stage["seconds"]}')
+        lines.append(f"# HELP {prefix}_stage_tokens_total Tokens vistos por etapa.")
+        lines.append(f"# TYPE {prefix}_stage_tokens_total counter")
+        for name, stage in data['stages'].items():
+            lines.append(f'{prefix}_stage_tokens_total{{stage="{self._label(name)}"}} {stage["tokens"]}')
+        lines.append(f"# HELP {prefix}_stage_skipped_total Etapas omitidas por el prefiltrado.")
+        lines.append(f"# TYPE {prefix}_stage_skipped_total counter")
+        for name, count in data['skipped'].items():
+            lines.append(f'{prefix}_stage_skipped_total{{stage="{self._label(name)}"}} {count}')
+        for name, count in data['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {count}")
+        lines.append(f"# HELP {prefix}_replacements_total Cambios realizados por tipo.")
+        lines.append(f"# TYPE {prefix}_replacements_total counter")
+        for tipo, count in data['replacements'].items():
+            lines.append(f'{prefix}_replacements_total{{tipo="{self._label(tipo)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+def _load_table(path):
+    """
+    Lee una tabla de reemplazos desde un archivo externo: un objeto JSON
+    {clave: valor} o un archivo de texto con una entrada por línea separada
+    por tabulador. Las líneas vacías o que empiezan por # se ignoran.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.json'):
+            return json.load(file)
+        
+        table = {}
+        for line in file:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            key, value = line.split('\t', 1)
+            table[key] = value
+        return table
+
+def load_abbreviations(path):
+    """Lee una tabla de abreviaturas {abreviatura: expansión} (JSON o TSV)"""
+    return _load_table(path)
+
+def load_typos(path):
+    """Lee una tabla de errores conocidos {palabra_errónea: corrección} (JSON o TSV)"""
+    return _load_table(path)
+
+def load_word_list(path):
+    """
+    Lee una lista de palabras (una por línea, en minúsculas). Las líneas
+    vacías o que empiezan por # se ignoran.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return {line.strip().lower() for line in file if line.strip() and not line.startswith('#')}
+
+# Errores conocidos identificados en los textos, que se corrigen directamente
+# (tipo "Caso especial") antes de buscar en el diccionario
+DEFAULT_TYPOS = {
+    "anios": "años",
+    "ke": "que",
+    "minieros": "mineros",
+    "aosprrtetsyivo": "opresivo",
+    "traves": "través",
+    "pais": "país",
+    "abolicion": "abolición",
+    "arquitectonico": "arquitectónico",
+    "artistico": "artístico",
+    "centroaaaaamericana": "centroamericana",
+    "nuevahispanas": "novohispanas",
+    "Meeeexico": "México",
+    "mexico": "México",
+    "Mexico": "México",
+    "Golfo": "Golfo",
+    "civilizacion": "civilización",
+    "region": "región",
+    "termino": "término",
+    "revolucion": "revolución",
+    "Nacion": "Nación",
+    "Mex": "México"
+}
+
+# Vocales acentuadas y con diéresis sin tilde (la ñ se conserva)
+ACCENT_FOLD = str.maketrans('áéíóúüàèìòù', 'aeiouuaeiou')
+
+# Letras repetidas seguidas
+REPEAT_PATTERN = re.compile(r'(.)\1+')
+
+# Reglas de la clave fonética del español, en orden: ch y ll, qu/g/gu/c según
+# la vocal siguiente (g suave antes de gu, para no volver a cambiar la g que
+# deja gu), k/q, z/s, b/v, h muda, ñ y x
+PHONETIC_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'ch', 'C'), (r'll', 'y'), (r'qu(?=[ei])', 'k'), (r'g(?=[ei])', 'j'), (r'gu(?=[ei])', 'g'),
+    (r'c(?=[ei])', 's'), (r'[cqk]', 'k'), (r'z', 's'), (r'[vw]', 'b'), (r'h', ''), (r'ñ', 'ni'), (r'x', 'ks')
+)]
+
+def fold_accents(word):
+    """Clave sin tildes: "revolucion" y "revolución" comparten clave"""
+    return word.translate(ACCENT_FOLD)
+
+def collapse_repeats(word):
+    """Clave sin tildes ni letras repetidas: "Meeeexico" y "méxico" comparten clave"""
+    return REPEAT_PATTERN.sub(r'\1', fold_accents(word))
+
+def phonetic_key(word):
+    """Clave fonética: "ke" y "que", "anios" y "años", "asta" y "hasta" comparten clave"""
+    key = fold_accents(word)
+    for pattern, replacement in PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    return REPEAT_PATTERN.sub(r'\1', key)
+
+class NormalizedIndex:
+    """
+    Índices hash de claves normalizadas a palabras del léxico: sin tildes,
+    sin letras repetidas y fonética. Muchos errores son sistemáticos
+    (tildes que faltan, letras repetidas, ke/que, b/v, h muda) y se
+    resuelven así con una consulta de diccionario, sin distancia de edición.
+    Las claves se prueban en ese orden, de la más a la menos estricta.
+    """
+    KEYS = (('accents', fold_accents), ('repeats', collapse_repeats), ('phonetic', phonetic_key))
+    
+    def __init__(self, words):
+        # Cada clave apunta a una palabra o, si la comparten varias, a una tupla
+        self.tables = {name: {} for name, _ in self.KEYS}
+        for word in words:
+            self.add(word)
+    
+    def add(self, word):
+        """Añade una palabra (en minúsculas) a los índices"""
+        for name, key_function in self.KEYS:
+            table = self.tables[name]
+            key = key_function(word)
+            existing = table.get(key)
+            if existing is None:
+                table[key] = word
+            elif isinstance(existing, str):
+                if existing != word:
+                    table[key] = (existing, word)
+            elif word not in existing:
+                table[key] = existing + (word,)
+    
+    def lookup(self, word):
+        """
+        Palabra del léxico con la misma clave que `word` (en minúsculas), o
+        None. Si varias comparten la clave gana la más parecida a `word`.
+        """
+        for name, key_function in self.KEYS:
+            found = self.tables[name].get(key_function(word))
+            if found is None:
+                continue
+            if isinstance(found, str):
+                return found
+            from difflib import SequenceMatcher
+            return max(sorted(found), key=lambda candidate: SequenceMatcher(None, word, candidate).ratio())
+        return None
+
+class MappedNormalizedIndex(NormalizedIndex):
+    """Claves normalizadas compiladas en un léxico mapeado: se consultan sin cargarlas en memoria"""
+    def __init__(self, tables):
+        self.tables = tables
+    
+    def add(self, word):
+        raise TypeError("Las claves normalizadas de un léxico compilado son de solo lectura")
+
+class VocabularyLearner:
+    """
+    Cuenta en streaming las palabras en minúsculas de un corpus para aprender
+    su vocabulario propio (términos técnicos, topónimos, neologismos) y no
+    tener que buscarlo de nuevo en cada ejecución. El contador está acotado
+    a `max_entries` palabras: al llenarse descarta la mitad menos frecuente
+    y `error` guarda el máximo de apariciones que pudo perder una palabra.
+    """
+    def __init__(self, max_entries=1000000):
+        if max_entries < 2:
+            raise ValueError("max_entries debe ser al menos 2")
+        self.max_entries = max_entries
+        # palabra -> [apariciones, documentos en los que aparece]
+        self.counts = {}
+        self.error = 0
+        self.documents = 0
+    
+    def add_document(self, text):
+        """
+        Cuenta las palabras de un documento (un párrafo o un archivo). Solo
+        se cuentan palabras de más de dos letras que empiezan en minúscula,
+        las únicas que la etapa de ortografía llega a buscar.
+        """
+        seen = Counter(token for token in TOKEN_PATTERN.findall(text)
+                       if len(token) > 2 and token.isalpha() and token[0].islower())
+        counts = self.counts
+        for word, count in seen.items():
+            word = word.lower()
+            entry = counts.get(word)
+            if entry is None:
+                counts[word] = [count, 1]
+            else:
+                entry[0] += count
+                entry[1] += 1
+        self.documents += 1
+        if len(counts) > self.max_entries:
+            self._prune()
+    
+    def _prune(self):
+        """Descarta la mitad menos frecuente del contador"""
+        ordered = sorted(self.counts.items(), key=lambda item: item[1][0])
+        cut = len(ordered) // 2
+        self.error = max(self.error, ordered[cut - 1][1][0])
+        self.counts = dict(ordered[cut:])
+    
+    def promote(self, min_count=5, min_documents=2, min_share=0.5, known=()):
+        """
+        Palabras que pasan los umbrales, ordenadas: al menos `min_count`
+        apariciones en `min_documents` documentos distintos y, entre sus
+        variantes sin tildes ni letras repetidas, al menos `min_share` de
+        las apariciones. Así un error sistemático ("revolucion") no se
+        aprende si la forma correcta es más frecuente. Tras una poda, las
+        variantes pudieron perder hasta `error` apariciones, que se cuentan
+        en su favor: si la forma correcta se descartó, la duda no aprende
+        el error. Las palabras de `known` (el diccionario) no se devuelven.
+        """
+        variants = {}
+        for word, (count, _) in self.counts.items():
+            key = collapse_repeats(word)
+            variants[key] = variants.get(key, 0) + count
+        
+        promoted = []
+        for word, (count, documents) in self.counts.items():
+            if count < min_count or documents < min_documents or word in known:
+                continue
+            if count < min_share * (variants[collapse_repeats(word)] + self.error):
+                continue
+            promoted.append(word)
+        return sorted(promoted)
+
+class AbbreviationMatcher:
+    """
+    Autómata de Aho-Corasick sobre tokens que encuentra todas las abreviaturas
+    de la tabla en una sola pasada. Los espacios de las claves coinciden con
+    cualquier bloque de espacios del texto (incluidos saltos de línea).
+    """
+    def __init__(self, abbreviations):
+        # Transiciones, enlaces de fallo y patrón que termina en cada estado
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [None]
+        # Siguiente estado (por enlaces de fallo) en el que termina un patrón
+        self.output_link = [0]
+        
+        for abbr, expansion in abbreviations.items():
+            key = [self._symbol(token) for token in TOKEN_PATTERN.findall(abbr)]
+            if not key:
+                continue
+            tipo = "Sigla" if abbr.isupper() and len(abbr) > 1 else "Abreviatura"
+            
+            state = 0
+            for symbol in key:
+                next_state = self.goto[state].get(symbol)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][symbol] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.terminal.append(None)
+                    self.output_link.append(0)
+                state = next_state
+            self.terminal[state] = (len(key), expansion, tipo)
+        
+        # Longitud (en tokens) de la abreviatura más larga
+        self.max_length = max((entry[0] for entry in self.terminal if entry), default=0)
+        
+        # Huella de la tabla, para las cachés que dependen de ella
+        self.fingerprint = hashlib.sha1(
+            json.dumps(sorted(abbreviations.items()), ensure_ascii=False).encode('utf-8')).hexdigest()
+        
+        # Caracteres que necesita cada clave (sin contar espacios), quitando
+        # los conjuntos que contienen a otro: sirven para descartar un texto
+        # sin recorrerlo
+        required = {frozenset(char for char in abbr if not char.isspace()) for abbr in abbreviations}
+        required.discard(frozenset())
+        self.required_chars = [chars for chars in required
+                               if not any(other < chars for other in required)]
+        
+        self._build_failure_links()
+    
+    @staticmethod
+    def _symbol(token):
+        return ' ' if token.isspace() else token
+    
+    def might_match(self, chars):
+        """False si con el conjunto de caracteres `chars` ninguna clave puede aparecer"""
+        return any(required <= chars for required in self.required_chars)
+    
+    def _build_failure_links(self):
+        """Calcula los enlaces de fallo recorriendo el trie por niveles"""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for symbol, child in self.goto[state].items():
+                queue.append(child)
+                
+                fallback = self.fail[state]
+                while fallback and symbol not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                fail = self.goto[fallback].get(symbol, 0)
+                self.fail[child] = fail if fail != child else 0
+                self.output_link[child] = fail if self.terminal[fail] else self.output_link[fail]
+    
+    def crosses(self, tokens, position):
+        """
+        Indica si alguna abreviatura aparece abarcando tokens a ambos lados
+        de `position`, es decir, si cortar el texto ahí podría partirla.
+        """
+        goto = self.goto
+        fail = self.fail
+        terminal = self.terminal
+        output_link = self.output_link
+        
+        state = 0
+        start = max(0, position - self.max_length + 1)
+        for index in range(start, min(len(tokens), position + self.max_length - 1)):
+            token = tokens[index]
+            symbol = ' ' if token.isspace() else token
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            
+            match_state = state if terminal[state] else output_link[state]
+            while match_state:
+                if index - terminal[match_state][0] < position <= index:
+                    return True
+                match_state = output_link[match_state]
+        
+        return False
+    
+    def find(self, tokens, done=None):
+        """
+        Devuelve las coincidencias (inicio, fin, expansión, tipo) sin solaparse,
+        eligiendo la que empieza antes y, entre ellas, la más larga. Una
+        abreviatura no puede ir pegada a una palabra por ninguno de sus lados
+        y no puede incluir tokens marcados en `done`.
+        """
+        goto = self.goto
+        fail = self.fail
+        terminal = self.terminal
+        output_link = self.output_link
+        count = len(tokens)
+        
+        # Coincidencia más larga para cada posición de inicio
+        best = {}
+        state = 0
+        for position, token in enumerate(tokens):
+            if done is not None and done[position]:
+                state = 0
+                continue
+            
+            symbol = ' ' if token.isspace() else token
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            
+            match_state = state if terminal[state] else output_link[state]
+            while match_state:
+                length, expansion, tipo = terminal[match_state]
+                start = position - length + 1
+                end = position + 1
+                if (not (start > 0 and _is_word_char(tokens[start - 1][-1:]))
+                        and not (end < count and _is_word_char(tokens[end][:1]))
+                        and length > best.get(start, (0,))[0]):
+                    best[start] = (length, expansion, tipo)
+                match_state = output_link[match_state]
+        
+        matches = []
+        covered = 0
+        for start in sorted(best):
+            if start < covered:
+                continue
+            length, expansion, tipo = best[start]
+            matches.append((start, start + length, expansion, tipo))
+            covered = start + length
+        
+        return matches
+
+# Verbalización de números en español.
+# Tablas de las que se construye cualquier entero entre 0 y 999.999.999
+UNITS = (
+    "cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve",
+    "diez", "once", "doce", "trece", "catorce", "quince", "dieciséis", "diecisiete",
+    "dieciocho", "diecinueve", "veinte", "veintiuno", "veintidós", "veintitrés",
+    "veinticuatro", "veinticinco", "veintiséis", "veintisiete", "veintiocho", "veintinueve"
+)
+TENS = ("", "", "", "treinta", "cuarenta", "cincuenta", "sesenta", "setenta", "ochenta", "noventa")
+HUNDREDS = ("", "ciento", "doscientos", "trescientos", "cuatrocientos", "quinientos",
+            "seiscientos", "setecientos", "ochocientos", "novecientos")
+
+ORDINAL_UNITS = ("", "primero", "segundo", "tercero", "cuarto", "quinto", "sexto",
+                 "séptimo", "octavo", "noveno")
+ORDINAL_TEENS = ("décimo", "undécimo", "duodécimo", "decimotercero", "decimocuarto",
+                 "decimoquinto", "decimosexto", "decimoséptimo", "decimoctavo", "decimonoveno")
+ORDINAL_TENS = ("", "décimo", "vigésimo", "trigésimo", "cuadragésimo", "quincuagésimo",
+                "sexagésimo", "septuagésimo", "octogésimo", "nonagésimo")
+ORDINAL_HUNDREDS = ("", "centésimo", "ducentésimo", "tricentésimo", "cuadringentésimo",
+                    "quingentésimo", "sexcentésimo", "septingentésimo", "octingentésimo",
+                    "noningentésimo")
+
+MONTHS = ("enero", "febrero", "marzo", "abril", "mayo", "junio",
+          "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre")
+
+MAX_VERBALIZABLE = 999999999
+
+def _below_thousand(number):
+    """Texto de un número entre 1 y 999"""
+    if number == 100:
+        return "cien"
+    
+    hundreds, rest = divmod(number, 100)
+    parts = [HUNDREDS[hundreds]] if hundreds else []
+    if rest:
+        if rest < 30:
+            parts.append(UNITS[rest])
+        else:
+            tens, units = divmod(rest, 10)
+            parts.append(f"{TENS[tens]} y {UNITS[units]}" if units else TENS[tens])
+    return ' '.join(parts)
+
+def _apocope(text):
+    """Forma apocopada delante de "mil" y "millones" (uno -> un, veintiuno -> veintiún)"""
+    if text.endswith("veintiuno"):
+        return text[:-3] + "ún"
+    if text.endswith("uno"):
+        return text[:-1]
+    return text
+
+@lru_cache(maxsize=65536)
+def verbalize(number):
+    """Convierte un entero entre 0 y 999.999.999 a texto"""
+    if not 0 <= number <= MAX_VERBALIZABLE:
+        raise ValueError(f"Número fuera de rango: {number}")
+    if number == 0:
+        return UNITS[0]
+    
+    millions, rest = divmod(number, 1000000)
+    thousands, units = divmod(rest, 1000)
+    
+    parts = []
+    if millions == 1:
+        parts.append("un millón")
+    elif millions:
+        parts.append(f"{_apocope(_below_thousand(millions))} millones")
+    if thousands == 1:
+        parts.append("mil")
+    elif thousands:
+        parts.append(f"{_apocope(_below_thousand(thousands))} mil")
+    if units:
+        parts.append(_below_thousand(units))
+    
+    return ' '.join(parts)
+
+def _ordinal_below_thousand(number):
+    """Ordinal de un número entre 1 y 999"""
+    hundreds, rest = divmod(number, 100)
+    parts = [ORDINAL_HUNDREDS[hundreds]] if hundreds else []
+    if 10 <= rest < 20:
+        parts.append(ORDINAL_TEENS[rest - 10])
+    elif rest:
+        tens, units = divmod(rest, 10)
+        if tens:
+            parts.append(ORDINAL_TENS[tens])
+        if units:
+            parts.append(ORDINAL_UNITS[units])
+    return ' '.join(parts)
+
+@lru_cache(maxsize=65536)
+def verbalize_ordinal(number):
+    """Convierte un entero entre 1 y 999.999.999 a su ordinal (masculino)"""
+    if not 1 <= number <= MAX_VERBALIZABLE:
+        raise ValueError(f"Número fuera de rango: {number}")
+    
+    millions, rest = divmod(number, 1000000)
+    thousands, units = divmod(rest, 1000)
+    
+    parts = []
+    for count, suffix in ((millions, "millonésimo"), (thousands, "milésimo")):
+        if count == 1:
+            parts.append(suffix)
+        elif count:
+            prefix = _apocope(verbalize(count))
+            # Los prefijos de una palabra se escriben unidos: "dosmilésimo"
+            parts.append(prefix + suffix if ' ' not in prefix else f"{prefix} {suffix}")
+    if units:
+        parts.append(_ordinal_below_thousand(units))
+    
+    return ' '.join(parts)
+
+def verbalize_year(year):
+    """Lee un año como cardinal: 1810 -> "mil ochocientos diez" """
+    return verbalize(year)
+
+def verbalize_date(day, month, year):
+    """Fecha completa en texto: (28, 2, 2024) -> "veintiocho de febrero de dos mil veinticuatro" """
+    return f"{verbalize(day)} de {MONTHS[month - 1]} de {verbalize_year(year)}"
+
+def verbalize_many(numbers):
+    """
+    Verbaliza una secuencia de enteros de una vez. Cada valor distinto se
+    convierte una sola vez; devuelve la lista de textos en el mismo orden.
+    """
+    texts = {number: verbalize(number) for number in set(numbers)}
+    return [texts[number] for number in numbers]
+
+class TextCorrector:
+    # Etapas del proceso de corrección, en orden
+    STAGES = (
+        ('special_chars', '_special_chars_stage'),
+        ('abbreviations', '_abbreviations_stage'),
+        ('dates', '_dates_stage'),
+        ('numbers', '_numbers_stage'),
+        ('spelling', '_spelling_stage')
+    )
+    STAGE_METHODS = dict(STAGES)
+    
+    # Perfiles de etapas predefinidos
+    PROFILES = {
+        'full': ('special_chars', 'abbreviations', 'dates', 'numbers', 'spelling'),
+        'normalize': ('special_chars', 'abbreviations', 'dates', 'numbers'),
+        'spelling': ('special_chars', 'spelling'),
+        'clean': ('special_chars',)
+    }
+    
+    # Motores para ordenar los candidatos de corrección
+    SPELLING_ENGINES = ('difflib', 'numpy')
+    
+    # Similitud mínima de una sugerencia con difflib y, en el nivel de
+    # trigramas, la de la lista corta de candidatos y la de la sugerencia
+    SPELLING_CUTOFF = 0.7
+    TRIGRAM_MIN_SIMILARITY = 0.25
+    TRIGRAM_CUTOFF = 0.6
+    
+    def __init__(self, max_edit_distance=3, lexicon_path=None, cache_size=100000, cache_path=None,
+                 abbreviations_path=None, track_changes=True, metrics=False, spelling_engine='difflib',
+                 stages=None, prescan=True, paragraph_cache_size=0, paragraph_cache_path=None,
+                 trigram_tier=None, typos_path=None, normalized_lookup=True, accepted_path=None):
         # Diccionario para mapear abreviaturas
         self.abbreviation_dict = {
             "a.": "antes",
@@ -49,19 +1798,77 @@ class TextCorrector:
             "1200 a. C.": "mil doscientos antes de Cristo"
         }
         
-        # Diccionario español básico para corrección ortográfica
-        self.dictionary = self._load_spanish_dictionary()
-        
-        # Mapeo de números a texto
-        self.num_to_text = {
-            '0': 'cero', '1': 'uno', '2': 'dos', '3': 'tres', '4': 'cuatro',
-            '5': 'cinco', '6': 'seis', '7': 'siete', '8': 'ocho', '9': 'nueve',
-            '10': 'diez', '11': 'once', '12': 'doce', '13': 'trece', '14': 'catorce',
-            '15': 'quince', '16': 'dieciséis', '17': 'diecisiete', '18': 'dieciocho',
-            '19': 'diecinueve', '20': 'veinte', '30': 'treinta', '40': 'cuarenta',
-            '50': 'cincuenta', '60': 'sesenta', '70': 'setenta', '80': 'ochenta',
-            '90': 'noventa', '100': 'cien', '1000': 'mil'
-        }
+        # Diccionario español para corrección ortográfica: el básico en memoria
+        # o un léxico compilado y mapeado desde disco
+        if lexicon_path:
+            self.dictionary = MappedLexicon(lexicon_path)
+        else:
+            self.dictionary = WordSet(self._load_spanish_dictionary())
+        
+        # Protege las recargas de abreviaturas y del diccionario cuando la
+        # instancia se comparte entre hilos
+        self._lock = threading.RLock()
+        
+        # Índice de candidatos y caché de correcciones ligada al diccionario.
+        # Los candidatos se ordenan con difflib o con la distancia de edición
+        # acotada en NumPy (spelling_engine='numpy')
+        if spelling_engine not in self.SPELLING_ENGINES:
+            raise ValueError(f"Motor de ortografía desconocido: {spelling_engine}")
+        self.spelling_engine = spelling_engine
+        self.max_edit_distance = max_edit_distance
+        
+        # Las palabras de este nivel de distancia o superior que el índice de
+        # borrados deja sin sugerencia se buscan también por trigramas
+        # (None: desactivado)
+        self.trigram_tier = trigram_tier
+        
+        # Antes de la búsqueda aproximada, probar las claves normalizadas
+        # (sin tildes, sin repeticiones y fonética)
+        self.normalized_lookup = normalized_lookup
+        self.correction_cache = CorrectionCache(cache_size)
+        self.cache_path = cache_path
+        self.refresh_dictionary()
+        
+        if cache_path and os.path.exists(cache_path):
+            self.correction_cache.load(cache_path)
+        
+        # Errores conocidos (casos especiales): la tabla por defecto o una
+        # cargada de un archivo
+        self.typos_path = typos_path
+        self.special_cases = load_typos(typos_path) if typos_path else dict(DEFAULT_TYPOS)
+        
+        # Vocabulario aprendido del corpus (VocabularyLearner): palabras fuera
+        # del diccionario que se aceptan tal cual, sin búsqueda aproximada
+        self.accepted = set()
+        self._accepted_fingerprint = hashlib.sha1(b'').hexdigest()
+        self.accepted_path = accepted_path
+        if accepted_path and os.path.exists(accepted_path):
+            self.accept_words(load_word_list(accepted_path))
+        
+        # Las abreviaturas pueden venir de un archivo externo, que se vuelve a
+        # leer cuando cambia
+        self.abbreviations_path = abbreviations_path
+        self._abbreviations_stamp = None
+        if abbreviations_path:
+            self.reload_abbreviations()
+        else:
+            self.abbreviation_matcher = AbbreviationMatcher(self.abbreviation_dict)
+        
+        # Registro de cambios: se puede desactivar en producción
+        self.track_changes = track_changes
+        
+        # Instrumentación opcional; desactivada solo cuesta comprobar None
+        self.metrics = CorrectorMetrics() if metrics else None
+        
+        # Etapas por defecto (lista de nombres o perfil) y prefiltrado que
+        # omite las etapas que no pueden cambiar nada en el texto
+        self.stages = self.PROFILES['full'] if stages is None else self._resolve_stages(stages)
+        self.prescan = prescan
+        
+        # Caché de párrafos ya corregidos (desactivada con tamaño 0 y sin ruta)
+        self.paragraph_cache = None
+        if paragraph_cache_size or paragraph_cache_path:
+            self.paragraph_cache = ParagraphCache(paragraph_cache_size or 10000, paragraph_cache_path)
         
         # Lista para rastrear cambios realizados
         self.changes = []
@@ -114,548 +1921,1597 @@ class TextCorrector:
         ]
         dictionary.update(palabras_comunes)
         
-        # Meses y días
-        meses_dias = [
-            "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre",
-            "octubre", "noviembre", "diciembre", "lunes", "martes", "miércoles", "jueves", "viernes",
-            "sábado", "domingo"
-        ]
-        dictionary.update(meses_dias)
+        # Meses y días
+        meses_dias = [
+            "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre",
+            "octubre", "noviembre", "diciembre", "lunes", "martes", "miércoles", "jueves", "viernes",
+            "sábado", "domingo"
+        ]
+        dictionary.update(meses_dias)
+        
+        return dictionary
+    
+    def refresh_dictionary(self):
+        """
+        Reconstruye el índice de candidatos tras un cambio en el diccionario
+        e invalida las correcciones en caché que dependían de él.
+        """
+        with self._lock:
+            # Un conjunto asignado directamente pasa a contar sus cambios
+            if type(self.dictionary) is set:
+                self.dictionary = WordSet(self.dictionary)
+            
+            # Un léxico compilado trae el índice de borrados y las claves
+            # normalizadas en el propio archivo mapeado
+            mapped = isinstance(self.dictionary, MappedLexicon)
+            self.spelling_index = self.dictionary.delete_index(self.max_edit_distance) if mapped else None
+            if self.spelling_index is None:
+                self.spelling_index = SymmetricDeleteIndex(self.dictionary, self.max_edit_distance)
+            # La huella ligada a la caché incluye todo lo que cambia las
+            # sugerencias, así se descarta una caché guardada con otra
+            # configuración
+            fingerprint = dictionary_fingerprint(self.dictionary)
+            fingerprint = (f'd{self.max_edit_distance}:p{self.spelling_index.prefix_length}:'
+                           f'c{self.SPELLING_CUTOFF}:' + fingerprint)
+            if self.spelling_engine == 'numpy':
+                self.edit_scorer = EditDistanceScorer(self.dictionary)
+                fingerprint = 'numpy:' + fingerprint
+            else:
+                self.edit_scorer = None
+            self.normalized_index = None
+            if self.normalized_lookup:
+                self.normalized_index = (self.dictionary.normalized_index() if mapped
+                                         else NormalizedIndex(self.dictionary))
+                fingerprint = 'norm:' + fingerprint
+            self.trigram_index = None
+            if self.trigram_tier is not None:
+                self.trigram_index = TrigramIndex(self.dictionary)
+                fingerprint = (f'trigram{self.trigram_tier},n{self.trigram_index.n},'
+                               f's{self.TRIGRAM_MIN_SIMILARITY},c{self.TRIGRAM_CUTOFF}:' + fingerprint)
+            self.correction_cache.bind(fingerprint)
+            # Diccionario indexado y su versión (un léxico mapeado no cambia)
+            self._indexed_dictionary = self.dictionary
+            self._dictionary_version = getattr(self.dictionary, 'version', 0)
+    
+    def add_words(self, words):
+        """Añade palabras al diccionario en memoria (un léxico compilado es de solo lectura)"""
+        if isinstance(self.dictionary, MappedLexicon):
+            raise TypeError(f"El léxico compilado {self.dictionary.path} es de solo lectura: "
+                            "añada las palabras a su lista y vuelva a compilarlo")
+        self.dictionary.update(word.lower() for word in words)
+        self.refresh_dictionary()
+    
+    def accept_words(self, words):
+        """
+        Añade palabras a la lista de aceptadas: no se corrigen, pero tampoco
+        entran en el diccionario ni se proponen como corrección.
+        """
+        with self._lock:
+            self.accepted.update(word.lower() for word in words)
+            joined = '\n'.join(sorted(self.accepted))
+            self._accepted_fingerprint = hashlib.sha1(joined.encode('utf-8')).hexdigest()
+    
+    def learn(self, learner, min_count=5, min_documents=2, min_share=0.5):
+        """
+        Promueve a la lista de aceptadas las palabras de un VocabularyLearner
+        que pasan los umbrales. Se descartan las variantes sin tildes o con
+        letras repetidas de una palabra del diccionario: esas son errores que
+        las claves normalizadas ya corrigen sin búsqueda aproximada.
+        Devuelve las palabras nuevas.
+        """
+        self._check_dictionary()
+        if self.normalized_index is not None:
+            variants = self.normalized_index.tables['repeats']
+        else:
+            variants = {collapse_repeats(word) for word in self.dictionary}
+        words = [word for word in learner.promote(min_count, min_documents, min_share, known=self.dictionary)
+                 if word not in self.accepted and collapse_repeats(word) not in variants]
+        self.accept_words(words)
+        return words
+    
+    def save_accepted(self, path=None):
+        """Guarda la lista de aceptadas (una palabra por línea)"""
+        path = path or self.accepted_path
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            for word in sorted(self.accepted):
+                file.write(word + '\n')
+        os.replace(temp_path, path)
+    
+    def reload_abbreviations(self, force=False):
+        """
+        Vuelve a cargar las abreviaturas del archivo externo si ha cambiado
+        desde la última lectura. Devuelve True si se recargaron.
+        """
+        if not self.abbreviations_path:
+            return False
+        
+        stat = os.stat(self.abbreviations_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if not force and stamp == self._abbreviations_stamp:
+            return False
+        
+        with self._lock:
+            if not force and stamp == self._abbreviations_stamp:
+                return False
+            abbreviation_dict = load_abbreviations(self.abbreviations_path)
+            self.abbreviation_matcher = AbbreviationMatcher(abbreviation_dict)
+            self.abbreviation_dict = abbreviation_dict
+            self._abbreviations_stamp = stamp
+        return True
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['changes'] = []
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+    
+    def save(self, path):
+        """
+        Guarda el corrector ya construido (diccionario, índices, autómata de
+        abreviaturas, casos especiales y caché) en un artefacto binario
+        versionado que TextCorrector.load() restaura sin reconstruir nada.
+        Un léxico mapeado se guarda como referencia a su archivo.
+        """
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(ARTIFACT_HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION))
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Restaura un corrector guardado con save(). Solo deben cargarse
+        artefactos de confianza: el contenido se deserializa con pickle.
+        """
+        with open(path, 'rb') as file:
+            header = file.read(ARTIFACT_HEADER.size)
+            if len(header) != ARTIFACT_HEADER.size:
+                raise ValueError(f"Artefacto no válido: {path}")
+            magic, version = ARTIFACT_HEADER.unpack(header)
+            if magic != ARTIFACT_MAGIC:
+                raise ValueError(f"Artefacto no válido: {path}")
+            if version != ARTIFACT_VERSION:
+                raise ValueError(f"Versión de artefacto no soportada ({version}): {path}")
+            corrector = pickle.load(file)
+        
+        if not isinstance(corrector, cls):
+            raise ValueError(f"Artefacto no válido: {path}")
+        
+        # Si el léxico mapeado o las abreviaturas cambiaron desde la
+        # construcción, se rehace lo que dependía de ellos
+        if isinstance(corrector.dictionary, MappedLexicon):
+            fingerprint = dictionary_fingerprint(corrector.dictionary)
+            if not corrector.correction_cache.fingerprint.endswith(fingerprint):
+                corrector.refresh_dictionary()
+        corrector.reload_abbreviations()
+        return corrector
+    
+    def save_cache(self, path=None):
+        """Guarda la caché de correcciones en disco y confirma la de párrafos"""
+        path = path or self.cache_path
+        if path:
+            self.correction_cache.save(path)
+        if self.paragraph_cache is not None:
+            self.paragraph_cache.flush()
+    
+    def config_fingerprint(self, stages=None):
+        """
+        Huella de todo lo que influye en el resultado de una corrección:
+        diccionario y motor, abreviaturas, casos especiales, palabras
+        aceptadas, distancia máxima y etapas.
+        """
+        special = json.dumps(sorted(self.special_cases.items()), ensure_ascii=False)
+        parts = (self.correction_cache.fingerprint, self.abbreviation_matcher.fingerprint,
+                 hashlib.sha1(special.encode('utf-8')).hexdigest(), self._accepted_fingerprint,
+                 str(self.max_edit_distance), ','.join(self._resolve_stages(stages)))
+        return '/'.join(parts)
+    
+    def _resolve_stages(self, stages):
+        """
+        Convierte `stages` (None, nombre de perfil o lista de etapas en el
+        orden deseado) en la tupla de etapas a ejecutar.
+        """
+        if stages is None:
+            return self.stages
+        if isinstance(stages, str):
+            if stages not in self.PROFILES:
+                raise ValueError(f"Perfil de etapas desconocido: {stages}")
+            return self.PROFILES[stages]
+        
+        stages = tuple(stages)
+        for name in stages:
+            if name not in self.STAGE_METHODS:
+                raise ValueError(f"Etapa desconocida: {name}")
+        return stages
+    
+    def _prescan(self, text, stages):
+        """
+        Recorre el texto una vez y devuelve las etapas que no pueden cambiar
+        nada en él: sin cifras no hay fechas, sin cifras ni letras romanas no
+        hay números, sin los caracteres de ninguna abreviatura no hay
+        abreviaturas, etc. Solo se omiten etapas anteriores a la ortografía,
+        que es la única que introduce texto nuevo sin marcarlo como resuelto.
+        """
+        if not self.prescan:
+            return frozenset()
+        
+        chars = frozenset(text)
+        digits = any(char.isdecimal() for char in chars)
+        skip = set()
+        for name in stages:
+            if name == 'special_chars':
+                if chars <= VALID_CHARS and '  ' not in text and ' \n' not in text and '\n ' not in text:
+                    skip.add(name)
+            elif name == 'abbreviations':
+                if not self.abbreviation_matcher.might_match(chars):
+                    skip.add(name)
+            elif name == 'dates':
+                if not digits:
+                    skip.add(name)
+            elif name == 'numbers':
+                if not digits and chars.isdisjoint('IVXLCDM'):
+                    skip.add(name)
+            elif name == 'spelling':
+                if not any(char.isalpha() for char in chars):
+                    skip.add(name)
+                break
+        return skip
+    
+    def correct(self, text, track_changes=None, stages=None, budget_ms=None, deadline=None):
+        """
+        Corrige el texto y devuelve CorrectionResult(text, changes).
+        No guarda estado de la llamada en el corrector, así que una misma
+        instancia puede atender peticiones concurrentes desde varios hilos.
+        Con track_changes=False no se registra ningún cambio (changes es None).
+        `stages` elige las etapas y su orden (lista de nombres o perfil); por
+        defecto se usan las del corrector.
+        Con `budget_ms` (o `deadline`, un instante de time.monotonic) las
+        etapas deterministas se ejecutan completas y el tiempo restante se
+        dedica a la ortografía, empezando por las palabras más frecuentes.
+        Si el plazo se agota, el resultado lleva complete=False y en
+        `unchecked` las palabras (en minúsculas) que quedaron sin revisar.
+        """
+        self.reload_abbreviations()
+        if track_changes is None:
+            track_changes = self.track_changes
+        
+        # El texto se divide en tokens una sola vez; cada etapa los modifica
+        # en su sitio y el resultado se une al final:
+        # 1. Remover caracteres especiales no deseados
+        # 2. Reemplazar abreviaturas
+        # 3. Expandir fechas según formato
+        # 4. Convertir números a texto donde sea apropiado
+        # 5. Corregir ortografía
+        if budget_ms is None and deadline is None:
+            return CorrectionResult(*self._run_stages(text, self._resolve_stages(stages), track_changes))
+        
+        if budget_ms is not None:
+            limit = time.monotonic() + budget_ms / 1000.0
+            deadline = limit if deadline is None else min(deadline, limit)
+        budget = _Budget(deadline)
+        corrected, changes = self._run_stages(text, self._resolve_stages(stages), track_changes, budget)
+        
+        if self.metrics is not None:
+            self.metrics.increment(budgeted=1)
+            if budget.expired():
+                self.metrics.increment(budget_overruns=1)
+            if budget.unchecked:
+                self.metrics.increment(budget_partial=1, unchecked_words=len(budget.unchecked))
+        return CorrectionResult(corrected, changes, not budget.unchecked, tuple(budget.unchecked))
+    
+    async def correct_async(self, text, executor=None):
+        """Versión para asyncio: ejecuta correct() en un executor"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.correct, text)
+    
+    def correct_many(self, texts, track_changes=None, stages=None):
+        """
+        Corrige un lote de textos (tuits, campos de formulario, líneas de OCR)
+        y devuelve un CorrectionResult por texto, en el mismo orden.
+        Las palabras fuera del diccionario de todo el lote se reúnen antes de
+        la etapa de ortografía y cada palabra distinta se busca una sola vez,
+        así que el coste crece con las palabras únicas y no con el total.
+        """
+        self.reload_abbreviations()
+        if track_changes is None:
+            track_changes = self.track_changes
+        stages = self._resolve_stages(stages)
+        if 'spelling' in stages:
+            position = stages.index('spelling')
+            before, after = stages[:position], stages[position + 1:]
+        else:
+            before, after = stages, ()
+        
+        # Con métricas hace falta el registro para contar los reemplazos
+        keep_log = track_changes or self.metrics is not None
+        
+        documents = []
+        for text in texts:
+            tokens = self._tokenize(text)
+            changes = ChangeLog(text, tokens) if keep_log else None
+            done = bytearray(len(tokens))
+            skip = self._prescan(text, stages)
+            self._apply_stages(tokens, before, changes, done, skip)
+            documents.append((tokens, done, changes, skip))
+        
+        if 'spelling' in stages:
+            # Ortografía de todo el lote: reunir, resolver una vez y aplicar
+            start = time.perf_counter()
+            self._check_dictionary()
+            pending = []
+            for tokens, done, changes, skip in documents:
+                if changes is not None:
+                    changes.begin_stage('spelling')
+                pending.append([] if 'spelling' in skip else self._collect_spelling(tokens, done))
+            resolved = self._resolve_spelling(*pending)
+            for (tokens, _, changes, _), entries in zip(documents, pending):
+                self._apply_spelling(tokens, entries, resolved, changes)
+            
+            if self.metrics is not None:
+                replacements = {}
+                for _, _, changes, _ in documents:
+                    for tipo, count in changes.count_kinds(stage='spelling').items():
+                        replacements[tipo] = replacements.get(tipo, 0) + count
+                seen = sum(len(tokens) for tokens, _, _, _ in documents)
+                skipped = ['spelling' for _, _, _, skip in documents if 'spelling' in skip]
+                self.metrics.record_call([('spelling', time.perf_counter() - start, seen)], replacements,
+                                         calls=0, skipped=skipped)
+        
+        results = []
+        for tokens, done, changes, skip in documents:
+            if after:
+                self._apply_stages(tokens, after, changes, done, skip, calls=0)
+            results.append(CorrectionResult(''.join(tokens), changes if track_changes else None))
+        return results
+    
+    def correct_text(self, text):
+        """
+        Proceso completo de corrección del texto.
+        Devuelve (original, corregido) y deja los cambios en self.changes,
+        una lista de Change; para uso concurrente utilizar correct().
+        """
+        result = self.correct(text)
+        self.changes = list(result.changes) if result.changes is not None else []
+        return text, result.text
+    
+    def _tokenize(self, text):
+        """Divide el texto en palabras, bloques de espacios y signos sueltos"""
+        return TOKEN_PATTERN.findall(text)
+    
+    def _run_stages(self, text, stages, track_changes=True, budget=None):
+        """
+        Tokeniza el texto, aplica las etapas indicadas (por nombre) sobre la
+        lista de tokens y reconstruye el texto una única vez.
+        Devuelve el texto y su ChangeLog (o None si no se registran cambios).
+        Los resultados con plazo pueden ser parciales y no pasan por la
+        caché de párrafos.
+        """
+        tokens = self._tokenize(text)
+        if self.paragraph_cache is not None and budget is None and len(set(stages)) == len(stages):
+            return self._run_paragraphs(text, tokens, stages, track_changes)
+        changes = ChangeLog(text, tokens) if track_changes else None
+        return self._process_tokens(tokens, stages, changes, text, budget), changes
+    
+    def _run_paragraphs(self, text, tokens, stages, track_changes):
+        """
+        Corrige el texto párrafo a párrafo pasando por la caché de párrafos:
+        los que ya se corrigieron con la misma configuración se reutilizan sin
+        procesarlos. Los párrafos solo se separan en fronteras seguras, así
+        que el resultado es el mismo que corrigiendo el texto entero. Las
+        métricas cuentan una sola llamada por texto y, de los párrafos
+        reutilizados, solo sus reemplazos.
+        """
+        cache = self.paragraph_cache
+        config = self.config_fingerprint(stages)
+        
+        pieces = []
+        parts = []
+        offset = 0
+        start = 0
+        hits = 0
+        reused = {}
+        for end in self._paragraph_splits(tokens) + [len(tokens)]:
+            paragraph = ''.join(tokens[start:end])
+            key = cache.key(config, paragraph)
+            entry = cache.get(key)
+            if entry is None:
+                paragraph_tokens = tokens[start:end]
+                log = ChangeLog(paragraph, paragraph_tokens)
+                done = bytearray(len(paragraph_tokens))
+                self._apply_stages(paragraph_tokens, stages, log, done,
+                                   self._prescan(paragraph, stages), calls=0)
+                entry = (''.join(paragraph_tokens), log.spans())
+                cache.put(key, entry)
+            else:
+                hits += 1
+                for span in entry[1]:
+                    reused[span[3]] = reused.get(span[3], 0) + 1
+            pieces.append(entry[0])
+            parts.append((offset, entry[1]))
+            offset += len(paragraph)
+            start = end
+        
+        if self.metrics is not None:
+            self.metrics.record_call([], reused)
+            self.metrics.increment(paragraphs=len(parts), paragraph_cache_hits=hits)
+        
+        changes = None
+        if track_changes:
+            changes = ChangeLog(text, tokens)
+            changes.extend_spans(stages, parts)
+        return ''.join(pieces), changes
+    
+    def _paragraph_splits(self, tokens):
+        """Posiciones de los tokens que empiezan párrafo y en las que es seguro cortar"""
+        return [k for k in range(1, len(tokens))
+                if tokens[k - 1].count('\n') > 1 and not tokens[k].isspace() and self._is_safe_split(tokens, k)]
+    
+    def _process_tokens(self, tokens, stages, changes, text, budget=None):
+        """
+        Aplica las etapas sobre una lista de tokens (de `text`) y devuelve el
+        texto unido. `done` marca los tokens ya resueltos por una etapa
+        anterior (por ejemplo una abreviatura expandida), que las siguientes
+        etapas no vuelven a tocar.
+        """
+        done = bytearray(len(tokens))
+        self._apply_stages(tokens, stages, changes, done, self._prescan(text, stages), budget=budget)
+        return ''.join(tokens)
+    
+    def _apply_stages(self, tokens, stages, changes, done, skip=frozenset(), calls=1, budget=None):
+        """Ejecuta sobre los tokens, en su sitio, las etapas indicadas que no estén en `skip`"""
+        if self.metrics is not None:
+            self._apply_stages_measured(tokens, stages, changes, done, skip, calls, budget)
+            return
+        
+        for name in stages:
+            if changes is not None:
+                changes.begin_stage(name)
+            if name not in skip:
+                self._call_stage(name, tokens, done, changes, budget)
+    
+    def _call_stage(self, name, tokens, done, changes, budget=None):
+        """Ejecuta una etapa; de las etapas, solo la ortografía atiende al plazo"""
+        if budget is not None and name == 'spelling':
+            self._spelling_stage(tokens, done, changes, budget)
+        else:
+            getattr(self, self.STAGE_METHODS[name])(tokens, done, changes)
+    
+    def _apply_stages_measured(self, tokens, stages, changes, done, skip, calls, budget=None):
+        """
+        Igual que _apply_stages, pero midiendo cada etapa. Los reemplazos
+        por tipo se cuentan sobre un ChangeLog, que se crea aunque el llamador
+        no pida los cambios.
+        """
+        log = changes if changes is not None else ChangeLog(''.join(tokens), tokens)
+        first = len(log)
+        timings = []
+        skipped = []
+        
+        for name in stages:
+            log.begin_stage(name)
+            if name in skip:
+                skipped.append(name)
+                continue
+            seen = len(tokens)
+            start = time.perf_counter()
+            self._call_stage(name, tokens, done, log, budget)
+            timings.append((name, time.perf_counter() - start, seen))
         
-        return dictionary
+        self.metrics.record_call(timings, log.count_kinds(first), calls, skipped)
     
-    def correct_text(self, text):
-        """Proceso completo de corrección del texto"""
-        # Guardar el texto original para mostrarlo después
-        original_text = text
-        self.changes = []  # Reiniciar lista de cambios
+    def correct_stream(self, lines, chunk_size=65536, with_changes=False, stages=None):
+        """
+        Corrige un texto que llega línea a línea (por ejemplo un archivo
+        abierto) y va devolviendo el resultado por fragmentos, cortados solo
+        en fronteras seguras, de modo que la memoria queda acotada y unir los
+        fragmentos da el mismo texto que correct_text.
+        Con with_changes=True cada fragmento se devuelve como CorrectionResult
+        con sus propios cambios.
+        """
+        self.reload_abbreviations()
+        stages = self._resolve_stages(stages)
+        track_changes = with_changes and self.track_changes
         
-        # 1. Remover caracteres especiales no deseados
-        text = self.remove_special_chars(text)
+        pending = []
+        size = 0
+        limit = chunk_size
+        for line in lines:
+            pending.append(line)
+            size += len(line)
+            if size < limit:
+                continue
+            
+            tokens = self._tokenize(''.join(pending))
+            split = self._find_stream_split(tokens)
+            if not split:
+                # Sin frontera segura todavía: seguir leyendo
+                limit = size + chunk_size
+                pending = [''.join(tokens)]
+                continue
+            
+            rest = ''.join(tokens[split:])
+            del tokens[split:]
+            text = ''.join(tokens)
+            if self.paragraph_cache is not None and len(set(stages)) == len(stages):
+                chunk, changes = self._run_paragraphs(text, tokens, stages, track_changes)
+            else:
+                changes = ChangeLog(text, tokens) if track_changes else None
+                chunk = self._process_tokens(tokens, stages, changes, text)
+            yield CorrectionResult(chunk, changes) if with_changes else chunk
+            
+            pending = [rest]
+            size = len(rest)
+            limit = max(chunk_size, size + 1)
         
-        # 2. Reemplazar abreviaturas
-        text = self.replace_abbreviations(text)
+        if pending:
+            chunk, changes = self._run_stages(''.join(pending), stages, track_changes)
+            yield CorrectionResult(chunk, changes) if with_changes else chunk
+    
+    def _find_stream_split(self, tokens):
+        """
+        Busca dónde cortar una lista de tokens: justo después de un bloque de
+        espacios y sin partir ninguna abreviatura ni una referencia "año NNNN".
+        Entre los cortes de la segunda mitad prefiere fin de párrafo, luego fin
+        de frase, luego fin de línea y por último un espacio. Devuelve 0 si no
+        hay ningún corte seguro.
+        """
+        # Dejar margen suficiente para reconocer abreviaturas a la derecha
+        last = len(tokens) - max(self.abbreviation_matcher.max_length, 1)
+        half = len(tokens) // 2
+        best_split, best_rank = 0, -1
         
-        # 3. Expandir fechas según formato
-        text = self.expand_dates(text)
+        for k in range(last, 0, -1):
+            if k < half and best_split:
+                break
+            
+            space = tokens[k - 1]
+            if not space.isspace() or tokens[k].isspace():
+                continue
+            
+            newlines = space.count('\n')
+            if newlines > 1:
+                rank = 3
+            elif newlines and k > 1 and tokens[k - 2] in ('.', '?', '!'):
+                rank = 2
+            elif newlines:
+                rank = 1
+            else:
+                rank = 0
+            if rank <= best_rank:
+                continue
+            
+            if not self._is_safe_split(tokens, k):
+                continue
+            
+            best_split, best_rank = k, rank
+            if rank == 3:
+                break
         
-        # 4. Convertir números a texto donde sea apropiado
-        text = self.convert_numbers_to_text(text)
+        return best_split
+    
+    def shard_offsets(self, data, shard_size):
+        """
+        Posiciones (en bytes) en las que partir un texto UTF-8 (bytes o un
+        mmap) en trozos de unos `shard_size` bytes que se pueden corregir por
+        separado y unir después con el mismo resultado que corrigiéndolo
+        entero. Se usan las fronteras seguras de correct_stream, buscadas en
+        una ventana alrededor de cada punto de corte, así que no hace falta
+        decodificar el texto completo. Devuelve los inicios, empezando por 0.
+        """
+        size = len(data)
+        offsets = [0]
+        target = shard_size
+        # Tokens de contexto que necesita a la izquierda la comprobación de abreviaturas
+        margin = self.abbreviation_matcher.max_length + 2
         
-        # 5. Corregir ortografía
-        text = self.correct_spelling(text)
+        while target < size:
+            split = None
+            width = max(4096, shard_size // 16)
+            while split is None:
+                start = max(offsets[-1], target - width)
+                end = min(size, target + width)
+                # Empezar la ventana en un límite de carácter UTF-8
+                while start < end and 0x80 <= data[start] < 0xC0:
+                    start += 1
+                tokens = self._tokenize(data[start:end].decode('utf-8', 'surrogateescape'))
+                if end < size:
+                    # El último token puede estar cortado por la ventana
+                    tokens.pop()
+                k = self._find_stream_split(tokens)
+                if k > margin or (k and start == offsets[-1]):
+                    split = start + len(''.join(tokens[:k]).encode('utf-8', 'surrogateescape'))
+                elif start == offsets[-1] and end == size:
+                    # Sin ninguna frontera segura hasta el final: un solo trozo
+                    split = size
+                else:
+                    width *= 2
+            
+            if split >= size:
+                break
+            offsets.append(split)
+            target = split + shard_size
         
-        return original_text, text
+        return offsets
     
-    def add_change(self, original, corrected, tipo):
-        """Añade un cambio a la lista de cambios realizados"""
-        self.changes.append({
-            'tipo': tipo,
-            'original': original,
-            'corrected': corrected
-        })
+    def _is_safe_split(self, tokens, k):
+        """
+        Cortar antes del token k no parte una abreviatura ni una referencia
+        "año NNNN", ni en los tokens tal cual ni tal como quedan tras quitar
+        los caracteres especiales, que puede juntar tokens de ambos lados
+        ("a. #C." pasa a ser "a. C.")
+        """
+        if self._splits_reference(tokens, k):
+            return False
+        view, position = self._filtered_window(tokens, k)
+        if view is None:
+            return True
+        return position is not None and not self._splits_reference(view, position)
     
-    def remove_special_chars(self, text):
-        """Elimina caracteres especiales no deseados pero conserva puntuación necesaria"""
-        # Definir caracteres a conservar (alfanuméricos, puntuación básica, espacios)
-        valid_chars = string.ascii_letters + string.digits + "áéíóúÁÉÍÓÚüÜñÑ.,;:¿?¡!()[]-_\"' \n"
+    def _splits_reference(self, tokens, k):
+        return ((tokens[k].isdigit() and k > 1 and tokens[k - 2] == 'año')
+                or self.abbreviation_matcher.crosses(tokens, k))
+    
+    def _filtered_window(self, tokens, k):
+        """
+        Los tokens alrededor de la posición k tal como los deja la etapa de
+        caracteres especiales y la posición equivalente a k entre ellos, que
+        es None si el corte queda dentro de un token o si a la derecha no hay
+        contexto suficiente. Devuelve (None, None) si la etapa no cambiaría
+        nada en la ventana.
+        """
+        need = self.abbreviation_matcher.max_length + 2
+        changed = False
         
-        # Reemplazar múltiples espacios por uno solo
-        text_single_space = re.sub(r'\s+', ' ', text)
-        if text != text_single_space:
-            self.add_change(text, text_single_space, "Espacios múltiples")
-            text = text_single_space
+        left = []
+        kept = 0
+        i = k
+        while i > 0 and kept < need:
+            i -= 1
+            filtered = _strip_invalid(tokens[i])
+            changed = changed or filtered != tokens[i]
+            left.append(filtered)
+            kept += bool(filtered)
         
-        # Filtrar caracteres no deseados
-        filtered_text = ''.join(c for c in text if c in valid_chars)
-        if text != filtered_text:
-            self.add_change(text, filtered_text, "Caracteres especiales")
+        right = []
+        kept = 0
+        i = k
+        while i < len(tokens) and kept < need:
+            filtered = _strip_invalid(tokens[i])
+            changed = changed or filtered != tokens[i]
+            right.append(filtered)
+            kept += bool(filtered)
+            i += 1
         
-        return filtered_text
+        if not changed:
+            return None, None
+        if kept < need:
+            return right, None
+        
+        cut = sum(map(len, left))
+        view = self._tokenize(''.join(reversed(left)) + ''.join(right))
+        offset = 0
+        for position, token in enumerate(view):
+            if offset >= cut:
+                return view, position if offset == cut else None
+            offset += len(token)
+        return view, None
+    
+    def _run_single_stage(self, text, name):
+        """Ejecuta una sola etapa y añade sus cambios a self.changes"""
+        text, changes = self._run_stages(text, [name])
+        self.changes.extend(changes)
+        return text
+    
+    def remove_special_chars(self, text):
+        """Elimina caracteres especiales no deseados pero conserva puntuación necesaria"""
+        return self._run_single_stage(text, 'special_chars')
+    
+    def replace_abbreviations(self, text):
+        """Reemplaza abreviaturas según el diccionario de mapeo"""
+        return self._run_single_stage(text, 'abbreviations')
+    
+    def expand_dates(self, text):
+        """Expande fechas en formatos DD/MM/AAAA y DD-MM-AAAA"""
+        return self._run_single_stage(text, 'dates')
     
     def convert_numbers_to_text(self, text):
         """Convierte números a su representación textual"""
-        # Función para convertir un año completo a texto
-        def year_to_text(year_str):
-            year = int(year_str)
-            if year < 2000:
-                # Para años como 1810, 1821, etc.
-                siglo = year // 100
-                resto = year % 100
-                
-                siglo_texto = ""
-                if siglo == 18:
-                    siglo_texto = "mil ochocientos"
-                elif siglo == 19:
-                    siglo_texto = "mil novecientos"
-                elif siglo == 15:
-                    siglo_texto = "mil quinientos"
-                elif siglo == 16:
-                    siglo_texto = "mil seiscientos"
-                elif siglo == 17:
-                    siglo_texto = "mil setecientos"
-                elif siglo == 20:
-                    siglo_texto = "dos mil"
-                elif siglo == 14:
-                    siglo_texto = "mil cuatrocientos"
-                elif siglo == 13:
-                    siglo_texto = "mil trescientos"
-                elif siglo == 12:
-                    siglo_texto = "mil doscientos"
-                elif siglo == 11:
-                    siglo_texto = "mil cien"
-                elif siglo == 10:
-                    siglo_texto = "mil"
-                
-                if resto == 0:
-                    return siglo_texto
-                elif resto <= 20:
-                    return f"{siglo_texto} {self.num_to_text[str(resto)]}"
-                elif resto <= 29:
-                    return f"{siglo_texto} veinti{self.num_to_text[str(resto-20)]}"
-                else:
-                    decena = (resto // 10) * 10
-                    unidad = resto % 10
-                    if unidad == 0:
-                        return f"{siglo_texto} {self.num_to_text[str(decena)]}"
-                    else:
-                        return f"{siglo_texto} {self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-            else:
-                # Para años del 2000 en adelante
-                milenio = year // 1000
-                resto = year % 1000
-                
-                if resto == 0:
-                    return f"{self.num_to_text[str(milenio)]} mil"
-                else:
-                    centena = resto // 100
-                    decena_unidad = resto % 100
-                    
-                    texto = f"{self.num_to_text[str(milenio)]} mil"
-                    
-                    if centena > 0:
-                        if centena == 1:
-                            texto += " cien"
-                        elif centena == 5:
-                            texto += " quinientos"
-                        elif centena == 7:
-                            texto += " setecientos"
-                        elif centena == 9:
-                            texto += " novecientos"
-                        else:
-                            texto += f" {self.num_to_text[str(centena)]}cientos"
-                    
-                    if decena_unidad > 0:
-                        if decena_unidad <= 20:
-                            texto += f" {self.num_to_text[str(decena_unidad)]}"
-                        elif decena_unidad <= 29:
-                            texto += f" veinti{self.num_to_text[str(decena_unidad-20)]}"
-                        else:
-                            decena = (decena_unidad // 10) * 10
-                            unidad = decena_unidad % 10
-                            if unidad == 0:
-                                texto += f" {self.num_to_text[str(decena)]}"
-                            else:
-                                texto += f" {self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-                    
-                    return texto
-        
-        # Función para convertir números romanos a texto
-        def roman_to_text(roman):
-            roman_values = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
-            int_val = 0
-            for i in range(len(roman)):
-                if i > 0 and roman_values[roman[i]] > roman_values[roman[i-1]]:
-                    int_val += roman_values[roman[i]] - 2 * roman_values[roman[i-1]]
-                else:
-                    int_val += roman_values[roman[i]]
-            
-            # Convertir el valor entero a texto
-            if int_val <= 20:
-                return self.num_to_text[str(int_val)]
-            elif int_val < 100:
-                decena = (int_val // 10) * 10
-                unidad = int_val % 10
-                if unidad == 0:
-                    return self.num_to_text[str(decena)]
-                else:
-                    return f"{self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-            else:
-                # Para números mayores, mantener el número romano tal cual
-                return roman
+        return self._run_single_stage(text, 'numbers')
+    
+    def correct_spelling(self, text):
+        """Corrige errores ortográficos utilizando el diccionario y la distancia de Levenshtein"""
+        return self._run_single_stage(text, 'spelling')
+    
+    def _special_chars_stage(self, tokens, done, changes):
+        """Normaliza espacios (conservando los saltos de línea) y filtra caracteres no válidos"""
+        removed = False
         
-        # Copia del texto original para identificar cambios
-        original_text = text
+        for i, token in enumerate(tokens):
+            # Lo que ya resolvió una etapa anterior no se vuelve a filtrar
+            if done[i]:
+                continue
+            if token.isspace():
+                # Reemplazar múltiples espacios por uno solo, sin perder líneas
+                newlines = token.count('\n')
+                normalized = '\n' * newlines if newlines else ' '
+                if normalized != token:
+                    if changes is not None:
+                        changes.add(i, i + 1, "Espacios múltiples", normalized)
+                    tokens[i] = normalized
+            elif not (token.isascii() and token.isalnum()):
+                # Filtrar caracteres no deseados
+                filtered = _strip_invalid(token)
+                if filtered != token:
+                    if changes is not None:
+                        changes.add(i, i + 1, "Caracteres especiales", filtered)
+                    tokens[i] = filtered
+                    removed = True
         
-        # Buscar y reemplazar años en el texto
-        text = re.sub(r'\b(\d{4})\b', lambda m: year_to_text(m.group(1)), text)
+        # Al quitar un signo pueden quedar juntas dos partes de una palabra
+        if removed:
+            self._retokenize(tokens, done, changes)
+    
+    def _retokenize(self, tokens, done, changes):
+        """
+        Vuelve a tokenizar, en su sitio, los tramos de tokens sin resolver.
+        Los tokens que ya resolvió una etapa anterior (por ejemplo una
+        expansión de varias palabras) se conservan enteros y marcados.
+        """
+        new_tokens = []
+        new_done = bytearray()
+        # Token antiguo en cuya posición empieza cada token nuevo
+        sources = []
+        count = len(tokens)
+        i = 0
+        while i < count:
+            if done[i]:
+                new_tokens.append(tokens[i])
+                new_done.append(1)
+                sources.append(i)
+                i += 1
+                continue
+            
+            end = i
+            while end < count and not done[end]:
+                end += 1
+            starts = {}
+            position = 0
+            for k in range(i, end):
+                starts.setdefault(position, k)
+                position += len(tokens[k])
+            position = 0
+            for token in self._tokenize(''.join(tokens[i:end])):
+                new_tokens.append(token)
+                new_done.append(0)
+                sources.append(starts[position])
+                position += len(token)
+            i = end
         
-        # Buscar y reemplazar números romanos (I, II, III, IV, etc.)
-        text = re.sub(r'\b([IVXLCDM]+)\b', lambda m: roman_to_text(m.group(1)) if m.group(1).upper() == m.group(1) and re.match(r'^[IVXLCDM]+$', m.group(1)) else m.group(1), text)
+        if changes is not None:
+            changes.retokenize(sources)
+        tokens[:] = new_tokens
+        done[:] = new_done
+    
+    def _abbreviations_stage(self, tokens, done, changes):
+        """Sustituye abreviaturas y siglas, prefiriendo la coincidencia más larga"""
+        for start, end, expansion, tipo in self.abbreviation_matcher.find(tokens, done):
+            if changes is not None:
+                changes.add(start, end, tipo, expansion)
+            tokens[start] = expansion
+            for j in range(start + 1, end):
+                tokens[j] = ''
+            done[start:end] = b'\x01' * (end - start)
+    
+    def _expand_date(self, day, month, year):
+        """Expande una fecha completamente en texto, o devuelve None si no es válida"""
+        from datetime import datetime
+        try:
+            # Convertir a datetime para validar
+            datetime(int(year), int(month), int(day))
+        except ValueError:
+            return None
         
-        # Para otros números
-        words = text.split()
-        result = []
+        return verbalize_date(int(day), int(month), int(year))
+    
+    def _dates_stage(self, tokens, done, changes):
+        """Expande fechas DD/MM/AAAA, DD-MM-AAAA y referencias del tipo "año NNNN" """
+        count = len(tokens)
+        for i in range(count):
+            token = tokens[i]
+            if done[i] or not token.isdecimal():
+                continue
+            
+            # Fechas: día, separador, mes, el mismo separador y año de cuatro cifras
+            if len(token) <= 2 and i + 4 < count and not any(done[i + 1:i + 5]):
+                separator = tokens[i + 1]
+                day, month, year = token, tokens[i + 2], tokens[i + 4]
+                if (separator in ('/', '-') and tokens[i + 3] == separator
+                        and month.isdecimal() and len(month) <= 2
+                        and year.isdecimal() and len(year) == 4):
+                    expanded = self._expand_date(day, month, year)
+                    if expanded:
+                        if changes is not None:
+                            changes.add(i, i + 5, "Expansión de fecha", expanded)
+                        tokens[i] = expanded
+                        tokens[i + 1:i + 5] = ['', '', '', '']
+                        done[i:i + 5] = b'\x01\x01\x01\x01\x01'
+                        continue
+            
+            # También expandir referencias a años específicos
+            if 3 <= len(token) <= 4 and i >= 2 and tokens[i - 2] == 'año' and tokens[i - 1].isspace():
+                number_text = self._number_to_text(token)
+                if number_text != token:
+                    if changes is not None:
+                        changes.add(i, i + 1, "Número a texto", number_text)
+                    tokens[i] = number_text
+                    done[i] = 1
+    
+    def _roman_to_int(self, roman):
+        """Valor entero de un número romano"""
+        roman_values = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+        int_val = 0
+        for i in range(len(roman)):
+            if i > 0 and roman_values[roman[i]] > roman_values[roman[i-1]]:
+                int_val += roman_values[roman[i]] - 2 * roman_values[roman[i-1]]
+            else:
+                int_val += roman_values[roman[i]]
+        return int_val
+    
+    def _number_to_text(self, word):
+        """Convierte un número escrito con cifras a texto (si está en rango)"""
+        number = int(word)
+        return verbalize(number) if number <= MAX_VERBALIZABLE else word
+    
+    def _numbers_stage(self, tokens, done, changes):
+        """Convierte años, números sueltos y números romanos a texto"""
+        count = len(tokens)
+        positions = []
+        numbers = []
+        for i, token in enumerate(tokens):
+            if done[i]:
+                continue
+            
+            if token.isdecimal():
+                # Los años se convierten siempre; el resto de números solo si
+                # forman una palabra aislada entre espacios
+                isolated = ((i == 0 or tokens[i - 1].isspace())
+                            and (i + 1 == count or tokens[i + 1].isspace()))
+                number = int(token)
+                if (len(token) == 4 or isolated) and number <= MAX_VERBALIZABLE:
+                    positions.append(i)
+                    numbers.append(number)
+            elif ROMAN_PATTERN.fullmatch(token):
+                # Para números de 100 en adelante, mantener el número romano tal cual
+                number = self._roman_to_int(token)
+                if number < 100:
+                    positions.append(i)
+                    numbers.append(number)
         
-        for word in words:
-            # Si es un número puro y no parte de una fecha ya procesada
-            if word.isdigit() and not re.search(r'\d{1,2}[-/]\d{1,2}[-/]', word):
-                original_word = word
-                if word in self.num_to_text:
-                    word = self.num_to_text[word]
-                else:
-                    # Para números mayores construir la representación
-                    num = int(word)
-                    if num <= 99:
-                        if 21 <= num <= 29:
-                            word = "veinti" + self.num_to_text[str(num - 20)]
-                        elif 31 <= num <= 99:
-                            decena = (num // 10) * 10
-                            unidad = num % 10
-                            if unidad == 0:
-                                word = self.num_to_text[str(decena)]
-                            else:
-                                word = f"{self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-                        else:
-                            word = self.num_to_text.get(str(num), str(num))
-                    elif 100 <= num < 1000:
-                        centena = num // 100
-                        resto = num % 100
-                        
-                        centena_texto = ""
-                        if centena == 1 and resto == 0:
-                            word = "cien"
-                        elif centena == 1:
-                            centena_texto = "ciento"
-                        elif centena == 5:
-                            centena_texto = "quinientos"
-                        elif centena == 7:
-                            centena_texto = "setecientos"
-                        elif centena == 9:
-                            centena_texto = "novecientos"
-                        else:
-                            centena_texto = f"{self.num_to_text[str(centena)]}cientos"
-                        
-                        if resto > 0:
-                            resto_texto = ""
-                            if resto <= 20:
-                                resto_texto = self.num_to_text[str(resto)]
-                            elif 21 <= resto <= 29:
-                                resto_texto = "veinti" + self.num_to_text[str(resto - 20)]
-                            else:
-                                decena = (resto // 10) * 10
-                                unidad = resto % 10
-                                if unidad == 0:
-                                    resto_texto = self.num_to_text[str(decena)]
-                                else:
-                                    resto_texto = f"{self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-                            word = f"{centena_texto} {resto_texto}"
-                        else:
-                            word = centena_texto
-                    else:
-                        # Si es un número muy grande, usar year_to_text para años
-                        if 1000 <= num <= 2099:
-                            word = year_to_text(word)
-                
-                if original_word != word:
-                    self.add_change(original_word, word, "Número a texto")
+        # Todos los números del texto se verbalizan en bloque
+        for i, converted in zip(positions, verbalize_many(numbers)):
+            if changes is not None:
+                changes.add(i, i + 1, "Número a texto", converted)
+            tokens[i] = converted
+            done[i] = 1
+    
+    def _spelling_stage(self, tokens, done, changes, budget=None):
+        """Aplica los casos especiales conocidos y corrige palabras fuera del diccionario"""
+        self._check_dictionary()
+        pending = self._collect_spelling(tokens, done)
+        self._apply_spelling(tokens, pending, self._resolve_spelling(pending, budget=budget), changes)
+    
+    def _check_dictionary(self):
+        """
+        Si el diccionario se modificó directamente (o se sustituyó por otro),
+        rehace índice y caché
+        """
+        if self._dictionary_changed():
+            with self._lock:
+                if self._dictionary_changed():
+                    self.refresh_dictionary()
+    
+    def _dictionary_changed(self):
+        return (self.dictionary is not self._indexed_dictionary
+                or getattr(self.dictionary, 'version', 0) != self._dictionary_version)
+    
+    def _collect_spelling(self, tokens, done):
+        """
+        Primera mitad de la etapa de ortografía: devuelve, en orden, los
+        tokens a corregir como (posición, caso_especial, palabra_en_minúsculas).
+        Los casos especiales llevan su reemplazo y las palabras fuera del
+        diccionario, None.
+        """
+        pending = []
+        accepted = 0
+        for i, word in enumerate(tokens):
+            if done[i] or not _is_word_char(word[:1]):
+                continue
+            
+            # Aplicar primero los casos especiales conocidos
+            special = self.special_cases.get(word)
+            if special is not None:
+                if special != word:
+                    pending.append((i, special, None))
+                done[i] = 1
+                continue
+            
+            # Ignorar palabras cortas (artículos, preposiciones)
+            if len(word) <= 2:
+                continue
+            
+            # Convertir a minúsculas para la comparación
+            word_lower = word.lower()
+            
+            # Si la palabra no está en el diccionario y no es un nombre propio,
+            # habrá que buscar la palabra más cercana
+            if word_lower in self.dictionary or word[0].isupper():
+                continue
             
-            result.append(word)
+            # Las palabras aprendidas del corpus se aceptan sin buscarlas
+            if word_lower in self.accepted:
+                accepted += 1
+                continue
+            pending.append((i, None, word_lower))
+        
+        if accepted and self.metrics is not None:
+            self.metrics.increment(accepted_words=accepted)
+        return pending
+    
+    def _resolve_spelling(self, *pendings, budget=None):
+        """
+        Busca la corrección de cada palabra distinta fuera del diccionario de
+        una o varias listas de _collect_spelling, una sola vez por palabra.
+        Devuelve palabra_en_minúsculas -> corrección (o None). Con plazo, las
+        búsquedas que no caben quedan sin hacer y se anotan en `budget`.
+        """
+        resolved = {}
+        missing = []
+        frequency = Counter()
+        oov = 0
+        for pending in pendings:
+            for _, _, word_lower in pending:
+                if word_lower is None:
+                    continue
+                oov += 1
+                frequency[word_lower] += 1
+                if word_lower in resolved:
+                    continue
+                close_match = self.correction_cache.get(word_lower)
+                resolved[word_lower] = close_match
+                if close_match is CorrectionCache.MISSING:
+                    missing.append(word_lower)
         
-        converted_text = ' '.join(result)
-        if original_text != converted_text:
-            self.add_change(original_text, converted_text, "Conversión de números")
+        # Las palabras que no estaban en caché se buscan todas juntas o, con
+        # plazo, por tandas mientras quede tiempo
+        if missing:
+            if budget is None:
+                resolved.update(self._lookup_corrections(missing))
+            else:
+                resolved.update(self._lookup_within(missing, frequency, budget))
         
-        return converted_text
+        if self.metrics is not None:
+            self.metrics.increment(oov=oov, cache_hits=len(resolved) - len(missing))
+        return resolved
     
-    def expand_dates(self, text):
-        """Expande fechas en formatos DD/MM/AAAA y DD-MM-AAAA"""
-        # Función para convertir un día numérico a texto
-        def day_to_text(day_str):
-            day = int(day_str)
-            if day in range(1, 31):
-                if day <= 20:
-                    return self.num_to_text.get(str(day), day_str)
-                elif day <= 29:
-                    return "veinti" + self.num_to_text[str(day - 20)]
-                elif day == 30:
-                    return "treinta"
-                else:
-                    return "treinta y uno"
-            return day_str
-        
-        # Función para expandir una fecha completamente en texto
-        def expand_date(match):
-            date_str = match.group(0)
-            separator = '/' if '/' in date_str else '-'
-            parts = date_str.split(separator)
+    def _lookup_within(self, words, frequency, budget):
+        """
+        Busca las correcciones empezando por las palabras más frecuentes y
+        se detiene al agotarse el plazo: las restantes quedan sin corregir
+        (None), no se guardan en la caché y se anotan en budget.unchecked.
+        """
+        words = sorted(words, key=lambda word: -frequency[word])
+        # El motor NumPy compara varias palabras a la vez; difflib, de una en una
+        step = 1 if self.edit_scorer is None else 16
+        found = {}
+        for first in range(0, len(words), step):
+            if budget.expired():
+                rest = words[first:]
+                budget.unchecked.extend(rest)
+                found.update(dict.fromkeys(rest))
+                break
+            found.update(self._lookup_corrections(words[first:first + step]))
+        return found
+    
+    def _apply_spelling(self, tokens, pending, resolved, changes):
+        """Segunda mitad de la etapa de ortografía: aplica los reemplazos encontrados"""
+        for i, special, word_lower in pending:
+            if special is not None:
+                if changes is not None:
+                    changes.add(i, i + 1, "Caso especial", special)
+                tokens[i] = special
+                continue
             
-            if len(parts) == 3:
-                day, month, year = parts
+            close_match = resolved[word_lower]
+            if close_match:
+                # Conservar mayúsculas/minúsculas originales
+                word = tokens[i]
+                if word.islower():
+                    replacement = close_match
+                elif word.isupper():
+                    replacement = close_match.upper()
+                elif word[0].isupper():
+                    replacement = close_match.capitalize()
+                else:
+                    replacement = close_match
                 
-                # Validar que sean números
-                if all(part.isdigit() for part in parts):
-                    try:
-                        # Convertir a datetime para validar
-                        date_obj = datetime(int(year), int(month), int(day))
-                        
-                        # Nombres de los meses en español
-                        months = ["enero", "febrero", "marzo", "abril", "mayo", "junio", 
-                                 "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
-                        
-                        # Día en texto
-                        day_text = day_to_text(day)
-                        
-                        # Año en texto - utilizamos la misma lógica de conversion de numeros
-                        def year_to_text(year_str):
-                            year = int(year_str)
-                            if year < 2000:
-                                # Para años como 1810, 1821, etc.
-                                siglo = year // 100
-                                resto = year % 100
-                                
-                                siglo_texto = ""
-                                if siglo == 18:
-                                    siglo_texto = "mil ochocientos"
-                                elif siglo == 19:
-                                    siglo_texto = "mil novecientos"
-                                elif siglo == 15:
-                                    siglo_texto = "mil quinientos"
-                                elif siglo == 16:
-                                    siglo_texto = "mil seiscientos"
-                                elif siglo == 17:
-                                    siglo_texto = "mil setecientos"
-                                elif siglo == 20:
-                                    siglo_texto = "dos mil"
-                                elif siglo == 14:
-                                    siglo_texto = "mil cuatrocientos"
-                                elif siglo == 13:
-                                    siglo_texto = "mil trescientos"
-                                elif siglo == 12:
-                                    siglo_texto = "mil doscientos"
-                                elif siglo == 11:
-                                    siglo_texto = "mil cien"
-                                elif siglo == 10:
-                                    siglo_texto = "mil"
-                                
-                                if resto == 0:
-                                    return siglo_texto
-                                elif resto <= 20:
-                                    return f"{siglo_texto} {self.num_to_text[str(resto)]}"
-                                elif resto <= 29:
-                                    return f"{siglo_texto} veinti{self.num_to_text[str(resto-20)]}"
-                                else:
-                                    decena = (resto // 10) * 10
-                                    unidad = resto % 10
-                                    if unidad == 0:
-                                        return f"{siglo_texto} {self.num_to_text[str(decena)]}"
-                                    else:
-                                        return f"{siglo_texto} {self.num_to_text[str(decena)]} y {self.num_to_text[str(unidad)]}"
-                            else:
-                                # Para años del 2000 en adelante
-                                return f"dos mil {self.num_to_text.get(str(year - 2000), str(year - 2000))}"
-                        
-                        year_text = year_to_text(year)
-                        
-                        # Formatear la fecha completamente en texto
-                        expanded = f"{day_text} de {months[int(month)-1]} de {year_text}"
-                        
-                        # Registrar el cambio
-                        self.add_change(date_str, expanded, "Expansión de fecha")
-                        
-                        return expanded
-                    except ValueError:
-                        # Si la fecha no es válida, devolver la original
-                        return date_str
-            
-            return date_str
+                # Registrar el cambio y reemplazar la palabra
+                if changes is not None:
+                    changes.add(i, i + 1, "Ortografía", replacement)
+                tokens[i] = replacement
+    
+    def _lookup_corrections(self, words):
+        """Busca la mejor sugerencia de cada palabra en el índice y la guarda en la caché"""
+        # Primero las claves normalizadas: una consulta por palabra y clave
+        normalized = {}
+        if self.normalized_index is not None:
+            for word in words:
+                close_match = self.normalized_index.lookup(word)
+                if close_match is not None:
+                    normalized[word] = close_match
+            if normalized:
+                words = [word for word in words if word not in normalized]
+                if self.metrics is not None:
+                    self.metrics.increment(normalized_hits=len(normalized))
+        
+        # Solo cuentan como búsquedas aproximadas las que llegan a este nivel
+        if words and self.metrics is not None:
+            self.metrics.increment(fuzzy_lookups=len(words))
+        
+        if not words:
+            found = {}
+        elif self.edit_scorer is None:
+            found = {word: self.spelling_index.lookup(word, cutoff=self.SPELLING_CUTOFF) for word in words}
+        else:
+            bounds = [self._distance_tier(word) for word in words]
+            candidates = [self.spelling_index.candidates(word) for word in words]
+            found = dict(zip(words, self.edit_scorer.best_many(words, candidates, bounds)))
         
-        # Copia del texto original para identificar cambios
-        original_text = text
+        # Palabras muy deformadas: las del nivel de trigramas que siguen sin
+        # sugerencia se comparan solo con su lista corta de candidatos
+        if self.trigram_index is not None:
+            garbled = [word for word, close_match in found.items()
+                       if close_match is None and self._distance_tier(word) >= self.trigram_tier]
+            if garbled:
+                found.update(self._lookup_trigrams(garbled))
+                if self.metrics is not None:
+                    self.metrics.increment(trigram_lookups=len(garbled))
         
-        # Buscar y reemplazar fechas en formato DD/MM/AAAA
-        text = re.sub(r'\b\d{1,2}/\d{1,2}/\d{4}\b', expand_date, text)
+        found.update(normalized)
+        for word, close_match in found.items():
+            self.correction_cache.put(word, close_match)
+        return found
+
+    def _distance_tier(self, word):
+        """
+        Nivel de distancia de una palabra según su longitud: una edición
+        hasta 5 letras, dos hasta 8 y luego max_edit_distance
+        """
+        return min(self.max_edit_distance, max(1, len(word) // 3))
+    
+    def _lookup_trigrams(self, words):
+        """Busca la mejor sugerencia de cada palabra entre sus candidatos por trigramas"""
+        if self.edit_scorer is None:
+            return {word: self.trigram_index.lookup(word, self.TRIGRAM_MIN_SIMILARITY, self.TRIGRAM_CUTOFF)
+                    for word in words}
         
-        # Buscar y reemplazar fechas en formato DD-MM-AAAA
-        text = re.sub(r'\b\d{1,2}-\d{1,2}-\d{4}\b', expand_date, text)
+        # Se compara la clave sin tildes ni repeticiones, que admite hasta
+        # media palabra de ediciones
+        keys = [collapse_repeats(word) for word in words]
+        bounds = [max(self._distance_tier(word), len(key) // 2) for word, key in zip(words, keys)]
+        candidates = [self.trigram_index.candidates(word, min_similarity=self.TRIGRAM_MIN_SIMILARITY)
+                      for word in words]
+        return dict(zip(words, self.edit_scorer.best_many(keys, candidates, bounds)))
+
+class DiffReport:
+    """
+    Informe de diferencias construido a partir de los spans de los cambios,
+    sin comparar los textos completos. Cada grupo de cambios cercanos se
+    escribe en cuanto se recorre, como diferencia en línea con un poco de
+    contexto, así que el informe de un documento grande (o de los fragmentos
+    de correct_stream) sale por partes y con memoria acotada.
+    Formatos: 'terminal' (texto, con colores ANSI opcionales), 'json' (un
+    objeto JSON por línea) y 'html'.
+    """
+    FORMATS = ('terminal', 'json', 'html')
+    
+    # Colores ANSI para texto eliminado y añadido
+    DELETED = '\033[31m'
+    INSERTED = '\033[32m'
+    RESET = '\033[0m'
+    
+    HTML_HEADER = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Informe de cambios</title>
+<style>
+body { font-family: sans-serif; }
+.cambio { margin: 0.3em 0; }
+.pos { color: #666; font-size: 0.85em; margin-right: 1em; }
+code { white-space: pre-wrap; }
+del { background: #fdd; }
+ins { background: #dfd; text-decoration: none; }
+</style>
+</head>
+<body>
+"""
+    
+    def __init__(self, out, format='terminal', context=30, max_changes=None, color=False):
+        if format not in self.FORMATS:
+            raise ValueError(f"Formato de informe desconocido: {format}")
+        self.out = out
+        self.format = format
+        self.context = context
+        self.max_changes = max_changes
+        self.color = color
         
-        # También expandir referencias a años específicos
-        text = re.sub(r'año (\d{3,4})', lambda m: f"año {self.convert_numbers_to_text(m.group(1))}", text)
+        # Totales de todo el informe
+        self.documents = 0
+        self.total = 0
+        self.shown = 0
+        self.kinds = {}
         
-        # Expandir referencias a fechas como "28-02-2024"
-        text = re.sub(r'\b(\d{1,2})-(\d{1,2})-(\d{4})\b', expand_date, text)
+        # Posición dentro del documento actual
+        self.name = None
+        self._offset = 0
+        self._line = 1
+        self._line_start = 0
         
-        if original_text != text:
-            self.add_change(original_text, text, "Expansión de fechas")
+        if format == 'html':
+            out.write(self.HTML_HEADER)
+    
+    def begin(self, name=None):
+        """Empieza un documento; los fragmentos que se añadan después le pertenecen"""
+        self.documents += 1
+        self.name = name
+        self._offset = 0
+        self._line = 1
+        self._line_start = 0
         
-        return text
+        if self.format == 'terminal':
+            self.out.write(f"\nDiferencias{f' en {name}' if name else ''}:\n")
+            self.out.write("-" * 80 + "\n")
+        elif self.format == 'html':
+            self.out.write(f"<h2>{self._escape(name or f'Documento {self.documents}')}</h2>\n")
     
-    def replace_abbreviations(self, text):
-        """Reemplaza abreviaturas según el diccionario de mapeo"""
-        # Copia del texto original para identificar cambios
-        original_text = text
-        
-        # Crear un patrón de expresión regular con todas las abreviaturas
-        abbreviations = '|'.join(re.escape(abbr) for abbr in self.abbreviation_dict.keys())
-        pattern = r'(?<!\w)(' + abbreviations + r')(?!\w)'
-        
-        # Función para reemplazar cada abreviatura encontrada
-        def replace(match):
-            abbr = match.group(0)
-            expanded = self.abbreviation_dict[abbr]
-            self.add_change(abbr, expanded, "Abreviatura")
-            return expanded
-        
-        # Reemplazar abreviaturas
-        processed_text = text
-        
-        # Primero procesamos las siglas completas como INAH, UNESCO
-        for abbr, expansion in self.abbreviation_dict.items():
-            if abbr.isupper() and len(abbr) > 1:
-                # Para siglas, usamos un patrón más específico
-                pattern = r'\b' + re.escape(abbr) + r'\b'
-                processed_text = re.sub(pattern, expansion, processed_text)
-                
-                # Registrar el cambio si se encontró la abreviatura
-                if abbr in processed_text:
-                    self.add_change(abbr, expansion, "Sigla")
+    def write(self, changes, name=None):
+        """Informa de los cambios de un documento completo"""
+        self.begin(name)
+        self.add(changes)
+    
+    def add(self, changes):
+        """
+        Informa de los cambios de un fragmento (un ChangeLog) del documento
+        actual. Los fragmentos deben llegar en orden; las posiciones del
+        informe son relativas al documento completo.
+        """
+        if self.documents == 0:
+            self.begin()
+        text = changes.text
         
-        # Luego procesamos el resto de abreviaturas
-        processed_text = re.sub(pattern, replace, processed_text)
+        for kind, count in changes.count_kinds().items():
+            self.kinds[kind] = self.kinds.get(kind, 0) + count
         
-        if original_text != processed_text:
-            self.add_change(original_text, processed_text, "Expansión de abreviaturas")
+        # Agrupar los cambios efectivos que quedan a menos de `context` caracteres
+        hunk = []
+        cursor = 0
+        for index in changes.effective():
+            self.total += 1
+            if self.max_changes is not None and self.shown >= self.max_changes:
+                continue
+            self.shown += 1
+            start = changes.starts[index]
+            if hunk and start - hunk[-1][1] > self.context:
+                cursor = self._emit(text, hunk, cursor)
+                hunk = []
+            hunk.append((start, changes.ends[index], changes.KIND_NAMES[changes.kinds[index]],
+                         changes.replacements[index]))
+        if hunk:
+            cursor = self._emit(text, hunk, cursor)
         
-        return processed_text
+        # Avanzar la posición hasta el final del fragmento
+        self._advance(text, cursor, len(text))
+        self._offset += len(text)
     
-    def correct_spelling(self, text):
-        """Corrige errores ortográficos utilizando el diccionario y la distancia de Levenshtein"""
-        # Copia del texto original para identificar cambios
-        original_text = text
-        
-        # Casos especiales identificados en los textos
-        special_cases = {
-            "anios": "años",
-            "ke": "que",
-            "minieros": "mineros",
-            "aosprrtetsyivo": "opresivo",
-            "traves": "través",
-            "pais": "país",
-            "abolicion": "abolición",
-            "arquitectonico": "arquitectónico",
-            "artistico": "artístico",
-            "centroaaaaamericana": "centroamericana",
-            "nuevahispanas": "novohispanas",
-            "Meeeexico": "México",
-            "mexico": "México",
-            "Mexico": "México",
-            "Golfo": "Golfo",
-            "civilizacion": "civilización",
-            "region": "región",
-            "termino": "término",
-            "revolucion": "revolución",
-            "Nacion": "Nación",
-            "Mex": "México"
-        }
-        
-        corrected_text = text
+    def _advance(self, text, cursor, position):
+        """Actualiza línea e inicio de línea recorriendo text[cursor:position]"""
+        newlines = text.count('\n', cursor, position)
+        if newlines:
+            self._line += newlines
+            self._line_start = self._offset + text.rindex('\n', cursor, position) + 1
+    
+    def _emit(self, text, hunk, cursor):
+        """Escribe un grupo de cambios y devuelve la posición hasta la que se avanzó"""
+        first = hunk[0][0]
+        self._advance(text, cursor, first)
+        line = self._line
+        column = self._offset + first - self._line_start + 1
         
-        # Aplicar primero los casos especiales conocidos
-        for wrong, correct in special_cases.items():
-            pattern = r'\b' + re.escape(wrong) + r'\b'
-            corrected_text = re.sub(pattern, correct, corrected_text)
-            
-            # Registrar el cambio si se encontró la palabra errónea
-            if re.search(pattern, text):
-                self.add_change(wrong, correct, "Caso especial")
+        # Contexto dentro de la misma línea, antes y después del grupo
+        before = text[max(0, first - self.context):first].rpartition('\n')[2]
+        after = text[hunk[-1][1]:hunk[-1][1] + self.context].partition('\n')[0]
         
-        # Luego corregir otras palabras usando la distancia de Levenshtein
-        words = re.findall(r'\b\w+\b', corrected_text)
+        parts = []
+        position = first
+        for start, end, kind, replacement in hunk:
+            if start > position:
+                parts.append((None, text[position:start], None))
+            parts.append((kind, text[start:end], replacement))
+            position = end
         
-        for word in words:
-            # Ignorar palabras cortas (artículos, preposiciones)
-            if len(word) <= 2:
+        if self.format == 'terminal':
+            self._emit_terminal(line, column, before, parts, after)
+        elif self.format == 'json':
+            self._emit_json(line, column, first, before, parts, after)
+        else:
+            self._emit_html(line, column, before, parts, after)
+        return first
+    
+    @staticmethod
+    def _visible(text):
+        """Hace visibles los saltos de línea y tabuladores dentro de una línea del informe"""
+        return text.replace('\n', '\u21b5').replace('\t', '\u2192')
+    
+    @staticmethod
+    def _escape(text):
+        return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+    
+    def _emit_terminal(self, line, column, before, parts, after):
+        kinds = ', '.join(dict.fromkeys(kind for kind, _, _ in parts if kind))
+        pieces = [self._visible(before)]
+        for kind, original, replacement in parts:
+            if kind is None:
+                pieces.append(self._visible(original))
+            elif self.color:
+                pieces.append(f"{self.DELETED}{self._visible(original)}{self.RESET}"
+                              f"{self.INSERTED}{self._visible(replacement)}{self.RESET}")
+            else:
+                if original:
+                    pieces.append(f"[-{self._visible(original)}-]")
+                if replacement:
+                    pieces.append(f"{{+{self._visible(replacement)}+}}")
+        pieces.append(self._visible(after))
+        self.out.write(f"{self.name + ':' if self.name else ''}{line}:{column} ({kinds})\n")
+        self.out.write(f"    {''.join(pieces)}\n")
+    
+    def _emit_json(self, line, column, first, before, parts, after):
+        cambios = []
+        position = self._offset + first
+        for kind, original, replacement in parts:
+            if kind is not None:
+                cambios.append({'tipo': kind, 'inicio': position, 'fin': position + len(original),
+                                'original': original, 'corregido': replacement})
+            position += len(original)
+        record = {'documento': self.name, 'linea': line, 'columna': column,
+                  'antes': before, 'despues': after, 'cambios': cambios}
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def _emit_html(self, line, column, before, parts, after):
+        pieces = [self._escape(before)]
+        for kind, original, replacement in parts:
+            if kind is None:
+                pieces.append(self._escape(original))
                 continue
-                
-            # Convertir a minúsculas para la comparación
-            word_lower = word.lower()
-            
-            # Si la palabra no está en el diccionario y no es un nombre propio
-            if word_lower not in self.dictionary and not word[0].isupper():
-                # Buscar la palabra más cercana
-                close_matches = get_close_matches(word_lower, self.dictionary, n=1, cutoff=0.7)
-                
-                if close_matches:
-                    # Conservar mayúsculas/minúsculas originales
-                    if word.islower():
-                        replacement = close_matches[0]
-                    elif word.isupper():
-                        replacement = close_matches[0].upper()
-                    elif word[0].isupper():
-                        replacement = close_matches[0].capitalize()
-                    else:
-                        replacement = close_matches[0]
-                    
-                    # Registrar el cambio
-                    self.add_change(word, replacement, "Ortografía")
-                    
-                    # Reemplazar la palabra en el texto
-                    pattern = r'\b' + re.escape(word) + r'\b'
-                    corrected_text = re.sub(pattern, replacement, corrected_text)
+            title = self._escape(kind)
+            if original:
+                pieces.append(f'<del title="{title}">{self._escape(original)}</del>')
+            if replacement:
+                pieces.append(f'<ins title="{title}">{self._escape(replacement)}</ins>')
+        pieces.append(self._escape(after))
+        self.out.write(f'<div class="cambio"><span class="pos">línea {line}, columna {column}</span>'
+                       f'<code>{"".join(pieces)}</code></div>\n')
+    
+    def summary(self):
+        """Totales del informe en un diccionario serializable a JSON"""
+        return {
+            'documentos': self.documents,
+            'cambios': self.total,
+            'mostrados': self.shown,
+            'por_tipo': dict(self.kinds)
+        }
+    
+    def close(self):
+        """Escribe el resumen final (y cierra el HTML); no cierra `out`"""
+        hidden = self.total - self.shown
+        if self.format == 'json':
+            self.out.write(json.dumps({'resumen': self.summary()}, ensure_ascii=False) + "\n")
+        elif self.format == 'html':
+            self.out.write("<h2>Resumen</h2>\n<ul>\n")
+            for kind, count in sorted(self.kinds.items()):
+                self.out.write(f"<li>{self._escape(kind)}: {count}</li>\n")
+            self.out.write("</ul>\n")
+            if hidden:
+                self.out.write(f"<p>... y {hidden} cambios más sin mostrar.</p>\n")
+            self.out.write("</body>\n</html>\n")
+        else:
+            self.out.write("-" * 80 + "\n")
+            if hidden:
+                self.out.write(f"... y {hidden} cambios más sin mostrar.\n")
+            resumen = ', '.join(f"{kind}: {count}" for kind, count in sorted(self.kinds.items()))
+            self.out.write(f"Cambios: {self.total}{f' ({resumen})' if resumen else ''}\n")
+        self.out.flush()
+
+def mostrar_cambios(original, corregido, changes, max_cambios=None):
+    """
+    Muestra en la terminal los cambios realizados como diferencias en
+    línea. `corregido` se conserva por compatibilidad: el informe se
+    construye solo a partir de los cambios, un ChangeLog o la lista de
+    Change que deja correct_text en self.changes (con posiciones en
+    `original`).
+    """
+    if changes and not isinstance(changes, ChangeLog):
+        spans = [(change.start, change.end, change.stage, change.tipo, change.corrected)
+                 for change in changes if isinstance(change, Change)]
+        changes = ChangeLog(original, [original])
+        changes.extend_spans(list(dict.fromkeys(span[2] for span in spans)), [(0, spans)])
+    
+    report = DiffReport(sys.stdout, max_changes=max_cambios, color=sys.stdout.isatty())
+    if changes:
+        report.write(changes)
+    report.close()
+
+# Corrector compartido por los procesos del modo lote. Se crea en el proceso
+# principal antes de arrancar el pool, así los procesos hijos lo heredan ya
+# construido (léxico, índices y autómatas) al hacer fork.
+_corrector_lote = None
+
+def _inicializar_lote(opciones, artefacto=None):
+    """Construye (o carga) el corrector en el proceso hijo si no se heredó (spawn)"""
+    global _corrector_lote
+    if _corrector_lote is None:
+        _corrector_lote = TextCorrector.load(artefacto) if artefacto else TextCorrector(**opciones)
+
+def _corregir_archivo(entrada, salida, tam_bloque, compresion_entrada=None, compresion_salida=None):
+    """Corrige un archivo del lote en modo flujo y devuelve su resumen"""
+    inicio = time.perf_counter()
+    resumen = {'archivo': entrada, 'salida': salida, 'bytes': os.path.getsize(entrada), 'cambios': 0}
+    try:
+        os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+        with open_text(entrada, 'r', compresion_entrada) as archivo_entrada, \
+                open_text(salida, 'w', compresion_salida) as archivo_salida:
+            for fragmento in _corrector_lote.correct_stream(archivo_entrada, tam_bloque, with_changes=True):
+                archivo_salida.write(fragmento.text)
+                resumen['cambios'] += len(fragmento.changes or ())
+        resumen['estado'] = 'ok'
+    except Exception as e:
+        resumen['estado'] = f"error: {e}"
+    resumen['segundos'] = round(time.perf_counter() - inicio, 4)
+    
+    # Las métricas del proceso hijo viajan con el resumen y se suman en el padre
+    if _corrector_lote.metrics is not None:
+        resumen['metricas'] = _corrector_lote.metrics.snapshot()
+        _corrector_lote.metrics.reset()
+    return resumen
+
+def _corregir_particion(entrada, inicio, fin, con_cambios):
+    """
+    Corrige en un proceso hijo los bytes [inicio, fin) de un archivo grande.
+    Devuelve el texto corregido, la longitud (en caracteres) del original,
+    sus cambios como spans relativos a la partición y las métricas.
+    """
+    with open(entrada, 'rb') as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+        texto = datos[inicio:fin].decode('utf-8')
+    # Los mismos saltos de línea que al leer el archivo en modo texto
+    texto = texto.replace('\r\n', '\n').replace('\r', '\n')
+    
+    resultado = _corrector_lote.correct(texto, track_changes=con_cambios)
+    spans = resultado.changes.spans() if resultado.changes is not None else None
+    
+    metricas = None
+    if _corrector_lote.metrics is not None:
+        metricas = _corrector_lote.metrics.snapshot()
+        _corrector_lote.metrics.reset()
+    return resultado.text, len(texto), spans, metricas
+
+def procesar_particionado(entrada, salida, corrector, opciones, jobs=None, tam_particion=8 * 1024 * 1024,
+                          artefacto=None, cambios=None, reporte=None, compresion_entrada=None,
+                          compresion_salida=None):
+    """
+    Corrige un único archivo grande repartiéndolo entre `jobs` procesos: el
+    archivo se mapea en memoria, se parte en fronteras seguras con
+    shard_offsets y las particiones corregidas se escriben en orden, de modo
+    que la salida es idéntica a la de un solo proceso. Los cambios se
+    escriben en `cambios` (JSONL, con posiciones en caracteres del documento
+    completo) y, si se pasa un DiffReport en `reporte`, se informa de ellos.
+    La entrada tiene que estar sin comprimir; la salida puede comprimirse.
+    """
+    global _corrector_lote
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if compression_format(entrada, compresion_entrada) is not None:
+        raise ValueError("Para particionar, el archivo de entrada debe estar sin comprimir")
+    
+    inicio = time.perf_counter()
+    total_bytes = os.path.getsize(entrada)
+    if total_bytes:
+        with open(entrada, 'rb') as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            posiciones = corrector.shard_offsets(datos, tam_particion)
+    else:
+        posiciones = []
+    particiones = list(zip(posiciones, posiciones[1:] + [total_bytes]))
+    con_cambios = bool(cambios or reporte) and corrector.track_changes
+    
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('fork' if 'fork' in metodos else None)
+    _corrector_lote = corrector
+    
+    print(f"\nProcesando {entrada} en {len(particiones)} particiones con {jobs or os.cpu_count()} procesos...")
+    desplazamiento = 0
+    total_cambios = 0
+    
+    def escribir(particion, futuro):
+        """Escribe el resultado de una partición con sus cambios trasladados al documento completo"""
+        nonlocal desplazamiento, total_cambios
+        texto, longitud, spans, metricas = futuro.result()
+        archivo_salida.write(texto)
+        if metricas and corrector.metrics is not None:
+            corrector.metrics.merge(metricas)
         
-        if original_text != corrected_text:
-            self.add_change(original_text, corrected_text, "Corrección ortográfica")
+        spans = spans or []
+        total_cambios += len(spans)
+        if archivo_cambios is not None:
+            for start, end, stage, tipo, replacement in spans:
+                archivo_cambios.write(json.dumps({
+                    'start': start + desplazamiento, 'end': end + desplazamiento, 'stage': stage,
+                    'tipo': tipo, 'corrected': replacement
+                }, ensure_ascii=False) + '\n')
+        if reporte is not None:
+            # El informe necesita el texto original de la partición
+            with open(entrada, 'rb') as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+                original = datos[particion[0]:particion[1]].decode('utf-8')
+            registro = ChangeLog(original.replace('\r\n', '\n').replace('\r', '\n'), ())
+            registro.extend_spans(list(dict.fromkeys(span[2] for span in spans)), [(0, spans)])
+            reporte.add(registro)
+        desplazamiento += longitud
+    
+    archivo_cambios = open(cambios, 'w', encoding='utf-8') if cambios else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=contexto,
+                             initializer=_inicializar_lote, initargs=(opciones, artefacto)) as pool, \
+            open_text(salida, 'w', compresion_salida) as archivo_salida:
+        if reporte is not None:
+            reporte.begin(entrada)
         
-        return corrected_text
+        # Como mucho dos particiones en vuelo por proceso: la memoria queda
+        # acotada aunque las particiones terminen desordenadas
+        limite = 2 * (jobs or os.cpu_count() or 1)
+        en_vuelo = deque()
+        for particion in particiones:
+            en_vuelo.append((particion, pool.submit(_corregir_particion, entrada, *particion, con_cambios)))
+            while len(en_vuelo) >= limite or (en_vuelo and en_vuelo[0][1].done()):
+                escribir(*en_vuelo.popleft())
+        while en_vuelo:
+            escribir(*en_vuelo.popleft())
+    if archivo_cambios is not None:
+        archivo_cambios.close()
+    segundos = time.perf_counter() - inicio
+    
+    print(f"Particiones: {len(particiones)}, cambios: {total_cambios}, "
+          f"{total_bytes / 1e6:.2f} MB en {segundos:.2f} s ({total_bytes / 1e6 / max(segundos, 1e-9):.2f} MB/s)")
+    return total_cambios
+
+def _ruta_comprimida(ruta, compresion):
+    """Cambia la extensión de compresión de una ruta de salida por la del formato pedido"""
+    if compresion is None:
+        return ruta
+    base, extension = os.path.splitext(ruta)
+    if extension.lower() not in COMPRESSION_FORMATS:
+        base = ruta
+    return base if compresion == 'none' else f"{base}.{compresion}"
+
+def _listar_archivos(patron):
+    """Archivos de un directorio (recursivamente) o de un patrón glob"""
+    if os.path.isdir(patron):
+        archivos = glob.glob(os.path.join(patron, '**', '*'), recursive=True)
+    else:
+        archivos = glob.glob(patron, recursive=True)
+    return [archivo for archivo in archivos if os.path.isfile(archivo)]
+
+def aprender_vocabulario(patron, corrector, min_frecuencia=5, min_documentos=2, min_consistencia=0.5,
+                         max_entradas=1000000, tam_bloque=65536, compresion=None):
+    """
+    Recorre en streaming los archivos del corpus (comprimidos o no) y
+    añade a las palabras aceptadas del corrector las que pasan los umbrales.
+    Cada párrafo cuenta como un documento; los párrafos muy largos se
+    cortan cada `tam_bloque` caracteres. Devuelve las palabras nuevas.
+    """
+    archivos = _listar_archivos(patron)
+    if not archivos:
+        raise ValueError(f"No se encontraron archivos en: {patron}")
+    
+    aprendiz = VocabularyLearner(max_entradas)
+    for archivo in archivos:
+        with open_text(archivo, 'r', compresion) as file:
+            parrafo = []
+            tam = 0
+            for linea in file:
+                if linea.strip():
+                    parrafo.append(linea)
+                    tam += len(linea)
+                    if tam < tam_bloque:
+                        continue
+                if parrafo:
+                    aprendiz.add_document(''.join(parrafo))
+                    parrafo = []
+                    tam = 0
+            if parrafo:
+                aprendiz.add_document(''.join(parrafo))
+    return corrector.learn(aprendiz, min_frecuencia, min_documentos, min_consistencia)
 
-def mostrar_cambios(original, corregido, changes):
+def procesar_lote(patron, directorio_salida, corrector, opciones, jobs=None, resumen=None,
+                  tam_bloque=65536, artefacto=None, compresion_entrada=None, compresion_salida=None):
     """
-    Muestra los cambios realizados en el texto de forma visual
+    Corrige todos los archivos de un directorio o patrón glob repartiéndolos
+    entre `jobs` procesos. Los archivos grandes se programan primero y al
+    terminar se escribe un resumen por archivo en JSON. Los archivos
+    comprimidos se leen y escriben comprimidos; `compresion_salida` cambia
+    el formato (y la extensión) de todas las salidas.
     """
-    print("\nTexto Original:")
-    print("-" * 80)
-    print(original)
-    print("-" * 80)
+    global _corrector_lote
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
     
-    print("\nTexto Corregido:")
-    print("-" * 80)
-    print(corregido)
-    print("-" * 80)
+    archivos = _listar_archivos(patron)
+    base = patron if os.path.isdir(patron) else None
+    if not archivos:
+        print(f"No se encontraron archivos en: {patron}")
+        return []
+    if base is None:
+        base = os.path.commonpath([os.path.dirname(os.path.abspath(archivo)) for archivo in archivos])
     
-    if changes:
-        print("\nDetalle de Cambios Realizados:")
-        print("-" * 80)
-        print(f"{'TIPO DE CAMBIO':<20} {'TEXTO ORIGINAL':<30} {'TEXTO CORREGIDO':<30}")
-        print("-" * 80)
-        
-        for change in changes:
-            # Limitar longitud para visualización
-            original = change['original']
-            corrected = change['corrected']
-            
-            # Solo mostrar cambios específicos, no textos completos
-            if len(original) > 28:
-                original = original[:25] + "..."
-            if len(corrected) > 28:
-                corrected = corrected[:25] + "..."
-            
-            print(f"{change['tipo']:<20} {original:<30} {corrected:<30}")
+    # Los archivos más grandes primero para equilibrar la carga
+    archivos.sort(key=os.path.getsize, reverse=True)
+    tareas = [(archivo, _ruta_comprimida(os.path.join(directorio_salida, os.path.relpath(os.path.abspath(archivo),
+                                                                                          os.path.abspath(base))),
+                                         compresion_salida))
+              for archivo in archivos]
     
-    # Visualizar las diferencias línea por línea
-    print("\nVisualizador de Diferencias:")
-    print("-" * 80)
+    # Con fork los procesos heredan el corrector ya construido
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('fork' if 'fork' in metodos else None)
+    _corrector_lote = corrector
     
-    # Dividir los textos en líneas
-    original_lines = original.split('\n')
-    corrected_lines = corregido.split('\n')
+    inicio = time.perf_counter()
+    resultados = []
+    print(f"\nProcesando {len(tareas)} archivos con {jobs or os.cpu_count()} procesos...")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=contexto,
+                             initializer=_inicializar_lote, initargs=(opciones, artefacto)) as pool:
+        futuros = [pool.submit(_corregir_archivo, entrada, salida, tam_bloque, compresion_entrada, compresion_salida)
+                   for entrada, salida in tareas]
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            metricas = resultado.pop('metricas', None)
+            if metricas and corrector.metrics is not None:
+                corrector.metrics.merge(metricas)
+            resultados.append(resultado)
+            if resultado['estado'] != 'ok':
+                print(f"{resultado['archivo']}: {resultado['estado']}")
+    segundos = time.perf_counter() - inicio
     
-    # Comparar línea por línea
-    for i in range(min(len(original_lines), len(corrected_lines))):
-        if original_lines[i] != corrected_lines[i]:
-            print(f"Línea {i+1}:")
-            print(f"  Original: {original_lines[i]}")
-            print(f"  Corregido: {corrected_lines[i]}")
-            print()
+    total_bytes = sum(resultado['bytes'] for resultado in resultados)
+    errores = sum(1 for resultado in resultados if resultado['estado'] != 'ok')
+    print(f"Archivos: {len(resultados)}, errores: {errores}, "
+          f"{total_bytes / 1e6:.2f} MB en {segundos:.2f} s ({total_bytes / 1e6 / max(segundos, 1e-9):.2f} MB/s)")
+    
+    resumen = resumen or os.path.join(directorio_salida, 'resumen_lote.json')
+    os.makedirs(os.path.dirname(resumen) or '.', exist_ok=True)
+    with open(resumen, 'w', encoding='utf-8') as file:
+        json.dump({
+            'archivos': sorted(resultados, key=lambda resultado: resultado['archivo']),
+            'total_bytes': total_bytes,
+            'errores': errores,
+            'segundos': round(segundos, 4)
+        }, file, ensure_ascii=False, indent=2)
+    print(f"Resumen guardado en: {resumen}")
+    
+    return resultados
 
 def main():
     """
@@ -702,45 +3558,319 @@ El florecimiento de la cultura olmeca se ubica alrededor del año 800 a. C., y n
 se clasifica en dos etapas de prosperidad: Etapa Olmeca I (1500-1200 a. C.) y Etapa
 Olmeca II (1200-400 a. C.)."""
     
+    parser = argparse.ArgumentParser(description="Corrector de textos en español")
+    parser.add_argument('archivo_entrada', nargs='?', help="Archivo de texto a corregir")
+    parser.add_argument('archivo_salida', nargs='?', help="Archivo donde guardar el texto corregido")
+    parser.add_argument('--lexico', metavar='RUTA',
+                        help="Léxico compilado que se usará como diccionario")
+    parser.add_argument('--compilar-lexico', nargs=2, metavar=('LISTA', 'SALIDA'),
+                        help="Compila una lista de palabras (una por línea) a un léxico compacto")
+    parser.add_argument('--cache', metavar='RUTA',
+                        help="Archivo donde cargar y guardar la caché de correcciones")
+    parser.add_argument('--abreviaturas', metavar='RUTA',
+                        help="Tabla de abreviaturas (JSON o texto separado por tabuladores)")
+    parser.add_argument('--errores', metavar='RUTA',
+                        help="Tabla de errores conocidos (JSON o texto separado por tabuladores)")
+    parser.add_argument('--sin-claves-normalizadas', action='store_true',
+                        help="No busca por claves sin tildes, sin repeticiones ni fonéticas")
+    parser.add_argument('--aceptadas', metavar='RUTA',
+                        help="Lista de palabras aceptadas sin corregir (vocabulario aprendido con --aprender)")
+    parser.add_argument('--aprender', metavar='PATRON',
+                        help="Aprende el vocabulario de un corpus (directorio o patrón glob) y lo añade a --aceptadas")
+    parser.add_argument('--min-frecuencia', type=int, default=5, metavar='N',
+                        help="Con --aprender, apariciones mínimas de una palabra")
+    parser.add_argument('--min-documentos', type=int, default=2, metavar='N',
+                        help="Con --aprender, párrafos distintos mínimos en los que aparece")
+    parser.add_argument('--min-consistencia', type=float, default=0.5, metavar='F',
+                        help="Con --aprender, fracción mínima de las apariciones de sus variantes "
+                             "sin tildes ni repeticiones")
+    parser.add_argument('--max-entradas', type=int, default=1000000, metavar='N',
+                        help="Con --aprender, palabras distintas que se cuentan a la vez como máximo")
+    parser.add_argument('--flujo', action='store_true',
+                        help="Procesa el archivo por fragmentos, escribiendo la salida sobre la marcha")
+    parser.add_argument('--tam-bloque', type=int, default=65536, metavar='N',
+                        help="Tamaño aproximado (en caracteres) de cada fragmento en modo flujo")
+    parser.add_argument('--lote', metavar='PATRON',
+                        help="Directorio o patrón glob con los archivos a corregir en paralelo")
+    parser.add_argument('--dir-salida', metavar='DIR',
+                        help="Directorio donde dejar los archivos corregidos del lote")
+    parser.add_argument('--jobs', type=int, metavar='N',
+                        help="Número de procesos del lote (por defecto, uno por núcleo)")
+    parser.add_argument('--compresion-entrada', choices=('gz', 'bz2', 'xz', 'zst', 'none'),
+                        help="Compresión de la entrada (por defecto, según la extensión)")
+    parser.add_argument('--compresion-salida', choices=('gz', 'bz2', 'xz', 'zst', 'none'),
+                        help="Compresión de la salida (por defecto, según la extensión)")
+    parser.add_argument('--particionar', action='store_true',
+                        help="Corrige un único archivo grande repartiendo sus particiones entre --jobs procesos")
+    parser.add_argument('--tam-particion', type=int, default=8 * 1024 * 1024, metavar='BYTES',
+                        help="Tamaño aproximado de cada partición con --particionar")
+    parser.add_argument('--cambios', metavar='RUTA',
+                        help="Con --particionar, guarda los cambios en JSONL con posiciones del documento completo")
+    parser.add_argument('--resumen', metavar='RUTA',
+                        help="Archivo JSON con el resumen por archivo del lote")
+    parser.add_argument('--metricas', metavar='RUTA',
+                        help="Guarda al terminar las métricas de rendimiento en JSON")
+    parser.add_argument('--motor', choices=TextCorrector.SPELLING_ENGINES, default='difflib',
+                        help="Motor para ordenar los candidatos de corrección ortográfica")
+    parser.add_argument('--nivel-trigramas', type=int, metavar='N',
+                        help="Busca por trigramas las palabras de nivel de distancia N o más "
+                             "que el índice de borrados deja sin corregir")
+    parser.add_argument('--etapas', metavar='ETAPAS',
+                        help="Perfil (%s) o lista de etapas separadas por comas, en orden"
+                             % ', '.join(TextCorrector.PROFILES))
+    parser.add_argument('--sin-prefiltro', action='store_true',
+                        help="Ejecuta todas las etapas sin comprobar antes si pueden cambiar algo")
+    parser.add_argument('--cache-parrafos', type=int, default=0, metavar='N',
+                        help="Reutiliza los párrafos ya corregidos (hasta N en memoria)")
+    parser.add_argument('--cache-parrafos-db', metavar='RUTA',
+                        help="Base SQLite donde conservar la caché de párrafos entre ejecuciones")
+    parser.add_argument('--reporte', metavar='RUTA',
+                        help="Escribe el informe de cambios en un archivo en lugar de la terminal")
+    parser.add_argument('--formato-reporte', choices=DiffReport.FORMATS, default='terminal',
+                        help="Formato del informe de cambios")
+    parser.add_argument('--max-cambios', type=int, metavar='N',
+                        help="Número máximo de cambios en el informe (en la terminal, 100 por defecto)")
+    parser.add_argument('--presupuesto-ms', type=float, metavar='MS',
+                        help="Tiempo máximo por texto: la ortografía se corta al agotarse")
+    parser.add_argument('--construir', metavar='RUTA',
+                        help="Construye el corrector con las opciones dadas y lo guarda como artefacto")
+    parser.add_argument('--artefacto', metavar='RUTA',
+                        help="Carga el corrector de un artefacto creado con --construir")
+    args = parser.parse_args()
+    
+    # Modo compilación de léxico
+    if args.compilar_lexico:
+        lista, salida = args.compilar_lexico
+        try:
+            with open(lista, 'r', encoding='utf-8') as file:
+                total = compile_lexicon(file, salida)
+        except Exception as e:
+            print(f"Error al compilar el léxico {lista}: {e}")
+            return 1
+        print(f"Léxico compilado con {total} palabras en: {salida}")
+        return 0
+    
+    # Etapas: un perfil o una lista separada por comas
+    etapas = None
+    if args.etapas:
+        etapas = args.etapas if args.etapas in TextCorrector.PROFILES else \
+            [nombre.strip() for nombre in args.etapas.split(',') if nombre.strip()]
+        desconocidas = [nombre for nombre in etapas if nombre not in TextCorrector.STAGE_METHODS] \
+            if isinstance(etapas, list) else []
+        if desconocidas:
+            print(f"Etapas desconocidas: {', '.join(desconocidas)}. Disponibles: "
+                  f"{', '.join(TextCorrector.STAGE_METHODS)} o un perfil ({', '.join(TextCorrector.PROFILES)}).")
+            return 1
+    
     # Inicializar el corrector
-    corrector = TextCorrector()
+    opciones = {
+        'lexicon_path': args.lexico,
+        'cache_path': args.cache,
+        'abbreviations_path': args.abreviaturas,
+        'typos_path': args.errores,
+        'normalized_lookup': not args.sin_claves_normalizadas,
+        'accepted_path': args.aceptadas,
+        'metrics': bool(args.metricas),
+        'spelling_engine': args.motor,
+        'trigram_tier': args.nivel_trigramas,
+        'stages': etapas,
+        'prescan': not args.sin_prefiltro,
+        'paragraph_cache_size': args.cache_parrafos,
+        'paragraph_cache_path': args.cache_parrafos_db
+    }
+    if args.artefacto:
+        try:
+            corrector = TextCorrector.load(args.artefacto)
+        except Exception as e:
+            print(f"Error al cargar el artefacto {args.artefacto}: {e}")
+            return 1
+        
+        # Opciones de ejecución que no forman parte del artefacto
+        if etapas:
+            corrector.stages = corrector._resolve_stages(etapas)
+        if args.sin_prefiltro:
+            corrector.prescan = False
+        if args.cache_parrafos or args.cache_parrafos_db:
+            corrector.paragraph_cache = ParagraphCache(args.cache_parrafos or 10000, args.cache_parrafos_db)
+        if args.metricas:
+            corrector.metrics = CorrectorMetrics()
+        if args.aceptadas:
+            corrector.accepted_path = args.aceptadas
+            if os.path.exists(args.aceptadas):
+                corrector.accept_words(load_word_list(args.aceptadas))
+        if args.cache:
+            corrector.cache_path = args.cache
+            if os.path.exists(args.cache):
+                corrector.correction_cache.load(args.cache)
+    else:
+        corrector = TextCorrector(**opciones)
+    
+    # Modo aprendizaje: vocabulario propio del corpus para no buscarlo
+    if args.aprender:
+        if not args.aceptadas:
+            print("Debe indicar con --aceptadas dónde guardar el vocabulario aprendido.")
+            return 1
+        try:
+            nuevas = aprender_vocabulario(args.aprender, corrector, args.min_frecuencia, args.min_documentos,
+                                          args.min_consistencia, args.max_entradas, args.tam_bloque,
+                                          args.compresion_entrada)
+            corrector.save_accepted(args.aceptadas)
+        except Exception as e:
+            print(f"Error al aprender el vocabulario de {args.aprender}: {e}")
+            return 1
+        print(f"{len(nuevas)} palabras nuevas aprendidas ({len(corrector.accepted)} en total) en: {args.aceptadas}")
+        return 0
+    
+    # Modo construcción: guardar el corrector listo para cargarlo rápido
+    if args.construir:
+        try:
+            corrector.save(args.construir)
+        except Exception as e:
+            print(f"Error al guardar el artefacto {args.construir}: {e}")
+            return 1
+        print(f"Artefacto del corrector guardado en: {args.construir}")
+        return 0
+    
+    def guardar_metricas():
+        if not args.metricas:
+            return
+        try:
+            with open(args.metricas, 'w', encoding='utf-8') as file:
+                json.dump(corrector.metrics.snapshot(), file, ensure_ascii=False, indent=2)
+            print(f"Métricas guardadas en: {args.metricas}")
+        except Exception as e:
+            print(f"Error al guardar las métricas {args.metricas}: {e}")
+    
+    # Modo lote: muchos archivos repartidos entre varios procesos
+    if args.lote:
+        if not args.dir_salida:
+            print("Debe indicar el directorio de salida del lote con --dir-salida.")
+            return 1
+        procesar_lote(args.lote, args.dir_salida, corrector, opciones, jobs=args.jobs,
+                      resumen=args.resumen, tam_bloque=args.tam_bloque, artefacto=args.artefacto,
+                      compresion_entrada=args.compresion_entrada, compresion_salida=args.compresion_salida)
+        guardar_metricas()
+        return 0
+    
+    # Informe de cambios: en un archivo si se pide, si no en la terminal
+    def abrir_reporte():
+        if not args.reporte:
+            return None, None
+        archivo = open(args.reporte, 'w', encoding='utf-8')
+        return archivo, DiffReport(archivo, args.formato_reporte, max_changes=args.max_cambios)
+    
+    # Con --reporte, todos los documentos de la ejecución van a un único informe
+    archivo_informe = informe = None
+    
+    def informar(original, corregido, cambios, nombre=None):
+        nonlocal archivo_informe, informe
+        if not args.reporte:
+            mostrar_cambios(original, corregido, cambios,
+                            max_cambios=100 if args.max_cambios is None else args.max_cambios)
+            return
+        try:
+            if informe is None:
+                archivo_informe, informe = abrir_reporte()
+            if cambios:
+                informe.write(cambios, nombre)
+        except Exception as e:
+            print(f"Error al guardar el informe {args.reporte}: {e}")
+    
+    def cerrar_informe():
+        if informe is None:
+            return
+        try:
+            with archivo_informe:
+                informe.close()
+            print(f"Informe de cambios guardado en: {args.reporte}")
+        except Exception as e:
+            print(f"Error al guardar el informe {args.reporte}: {e}")
     
     # Función para procesar texto desde archivo o texto directo
     def procesar_texto(texto=None, archivo=None):
         if archivo and os.path.exists(archivo):
             try:
-                with open(archivo, 'r', encoding='utf-8') as file:
+                with open_text(archivo, 'r', args.compresion_entrada) as file:
                     texto = file.read()
             except Exception as e:
                 print(f"Error al leer el archivo {archivo}: {e}")
                 return None, None, []
         
         if texto:
-            original, corregido = corrector.correct_text(texto)
-            return original, corregido, corrector.changes
+            resultado = corrector.correct(texto, budget_ms=args.presupuesto_ms)
+            if not resultado.complete:
+                print(f"Presupuesto de {args.presupuesto_ms:g} ms agotado: "
+                      f"{len(resultado.unchecked)} palabras quedaron sin revisar.")
+            return texto, resultado.text, resultado.changes
         return None, None, []
     
     # Procesamiento de los textos de ejemplo
-    if len(sys.argv) >= 2:
+    if args.archivo_entrada:
         # Modo procesamiento de archivo externo
-        if len(sys.argv) >= 3:
-            archivo_entrada = sys.argv[1]
-            archivo_salida = sys.argv[2]
-            
-            print(f"\nProcesando archivo: {archivo_entrada}")
-            original, corregido, cambios = procesar_texto(archivo=archivo_entrada)
+        if args.archivo_salida:
+            archivo_entrada = args.archivo_entrada
+            archivo_salida = args.archivo_salida
             
-            if original and corregido:
-                # Mostrar los cambios en la terminal
-                mostrar_cambios(original, corregido, cambios)
-                
-                # Guardar resultado en archivo
+            if args.particionar:
+                # Modo particionado: un archivo grande repartido entre procesos
+                try:
+                    archivo_reporte, reporte = abrir_reporte()
+                    try:
+                        procesar_particionado(archivo_entrada, archivo_salida, corrector, opciones, jobs=args.jobs,
+                                              tam_particion=args.tam_particion, artefacto=args.artefacto,
+                                              cambios=args.cambios, reporte=reporte,
+                                              compresion_entrada=args.compresion_entrada,
+                                              compresion_salida=args.compresion_salida)
+                        if reporte is not None:
+                            reporte.close()
+                            print(f"Informe de cambios guardado en: {args.reporte}")
+                    finally:
+                        if archivo_reporte is not None:
+                            archivo_reporte.close()
+                    if args.cambios:
+                        print(f"Cambios guardados en: {args.cambios}")
+                    print(f"\nTexto corregido guardado en: {archivo_salida}")
+                except Exception as e:
+                    print(f"Error al procesar el archivo {archivo_entrada}: {e}")
+            elif args.flujo:
+                # Modo flujo: memoria constante, sin mostrar el texto completo
+                print(f"\nProcesando archivo en modo flujo: {archivo_entrada}")
                 try:
-                    with open(archivo_salida, 'w', encoding='utf-8') as file:
-                        file.write(corregido)
+                    archivo_reporte, reporte = abrir_reporte()
+                    with open_text(archivo_entrada, 'r', args.compresion_entrada) as entrada, \
+                            open_text(archivo_salida, 'w', args.compresion_salida) as salida:
+                        if reporte is None:
+                            for fragmento in corrector.correct_stream(entrada, args.tam_bloque):
+                                salida.write(fragmento)
+                        else:
+                            # El informe se escribe fragmento a fragmento, junto con la salida
+                            with archivo_reporte:
+                                reporte.begin(archivo_entrada)
+                                for fragmento in corrector.correct_stream(entrada, args.tam_bloque,
+                                                                          with_changes=True):
+                                    salida.write(fragmento.text)
+                                    if fragmento.changes is not None:
+                                        reporte.add(fragmento.changes)
+                                reporte.close()
+                            print(f"Informe de cambios guardado en: {args.reporte}")
                     print(f"\nTexto corregido guardado en: {archivo_salida}")
                 except Exception as e:
-                    print(f"Error al guardar el archivo {archivo_salida}: {e}")
+                    print(f"Error al procesar el archivo {archivo_entrada}: {e}")
+            else:
+                print(f"\nProcesando archivo: {archivo_entrada}")
+                original, corregido, cambios = procesar_texto(archivo=archivo_entrada)
+                
+                if original and corregido:
+                    # Mostrar los cambios en la terminal (o en el informe)
+                    informar(original, corregido, cambios, archivo_entrada)
+                    
+                    # Guardar resultado en archivo
+                    try:
+                        with open_text(archivo_salida, 'w', args.compresion_salida) as file:
+                            file.write(corregido)
+                        print(f"\nTexto corregido guardado en: {archivo_salida}")
+                    except Exception as e:
+                        print(f"Error al guardar el archivo {archivo_salida}: {e}")
         else:
             print("Debe proporcionar archivo de entrada y salida.")
             print("Uso: python corrector_texto.py archivo_entrada.txt archivo_salida.txt")
@@ -751,17 +3881,29 @@ Olmeca II (1200-400 a. C.)."""
         
         print("\n===== TEXTO 1 =====")
         original1, corregido1, cambios1 = procesar_texto(texto=TEXTO1)
-        mostrar_cambios(original1, corregido1, cambios1)
+        informar(original1, corregido1, cambios1, 'TEXTO 1')
         
         print("\n===== TEXTO 2 =====")
         original2, corregido2, cambios2 = procesar_texto(texto=TEXTO2)
-        mostrar_cambios(original2, corregido2, cambios2)
+        informar(original2, corregido2, cambios2, 'TEXTO 2')
         
         print("\n=== INSTRUCCIONES DE USO CON ARCHIVOS ===")
         print("Para usar este programa con sus propios archivos, ejecute:")
         print("python corrector_texto.py archivo_entrada.txt archivo_salida.txt")
     
+    cerrar_informe()
+    
+    # Conservar la caché de correcciones para la siguiente ejecución
+    try:
+        corrector.save_cache()
+    except Exception as e:
+        print(f"Error al guardar la caché {args.cache}: {e}")
+    guardar_metricas()
+    
     return 0  # Código de salida exitosa
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    # Se ejecuta main() del módulo importado para que los artefactos guardados
+    # hagan referencia a corrector_texto y no a __main__
+    import corrector_texto
+    sys.exit(corrector_texto.main())
\ No newline at end of file
@@ -0,0 +1,492 @@
+"""
+Servidor de corrección de textos de larga duración.
+
+El corrector (diccionario, índices y autómatas) se construye una sola vez en
+el proceso principal y se reparte por fork a un grupo de procesos que lo
+comparten en modo copia en escritura. Las peticiones pequeñas se agrupan en
+lotes antes de enviarse a los procesos, y un límite de peticiones en curso
+rechaza con 503 las que llegan cuando el servidor está saturado.
+
+Protocolos:
+    HTTP en localhost:   POST /corregir con {"text": "...", "changes": false}
+                         o con varias peticiones JSONL (una por línea);
+                         GET /salud y GET /metricas (formato Prometheus).
+    Socket Unix:         una petición JSON por línea y una respuesta por línea.
+
+Cada petición puede llevar "budget_ms": el plazo cuenta desde que llega al
+servidor y, si se agota, la respuesta incluye "complete": false y en
+"unchecked" las palabras que quedaron sin revisar.
+
+Uso:
+    python servidor_corrector.py --puerto 8765 --procesos 4
+    python servidor_corrector.py --socket /tmp/corrector.sock
+    python servidor_corrector.py --carga http://127.0.0.1:8765 --peticiones 2000 --concurrencia 16
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from corrector_texto import CorrectorMetrics, TextCorrector
+
+# Corrector de cada proceso del grupo. Se asigna en el proceso principal antes
+# de crear el grupo para que los hijos lo hereden ya construido.
+_corrector_servidor = None
+
+def _crear_corrector(opciones, artefacto=None):
+    """Construye el corrector o lo carga de un artefacto precompilado"""
+    if not artefacto:
+        return TextCorrector(**opciones)
+    corrector = TextCorrector.load(artefacto)
+    if opciones.get('metrics'):
+        corrector.metrics = CorrectorMetrics()
+    return corrector
+
+def _inicializar_proceso(opciones, artefacto=None):
+    """Construye (o carga) el corrector en el proceso hijo si no se heredó (spawn)"""
+    global _corrector_servidor
+    if _corrector_servidor is None:
+        _corrector_servidor = _crear_corrector(opciones, artefacto)
+
+def _cambio_a_dict(change):
+    return {'start': change.start, 'end': change.end, 'stage': change.stage, 'tipo': change.tipo,
+            'original': change.original, 'corrected': change.corrected}
+
+def _corregir_textos(peticiones):
+    """
+    Corrige en el proceso hijo un lote de (texto, con_cambios, plazo). El
+    plazo es un instante de time.monotonic (común a todos los procesos) o
+    None. Devuelve las respuestas y, si están activas, las métricas
+    acumuladas desde el último lote.
+    """
+    respuestas = []
+    for texto, con_cambios, plazo in peticiones:
+        resultado = _corrector_servidor.correct(texto, track_changes=con_cambios, deadline=plazo)
+        respuesta = {'text': resultado.text}
+        if resultado.changes is not None:
+            respuesta['changes'] = [_cambio_a_dict(change) for change in resultado.changes]
+        if not resultado.complete:
+            respuesta['complete'] = False
+            respuesta['unchecked'] = list(resultado.unchecked)
+        respuestas.append(respuesta)
+
+    metricas = None
+    if _corrector_servidor.metrics is not None:
+        metricas = _corrector_servidor.metrics.snapshot()
+        _corrector_servidor.metrics.reset()
+    return respuestas, metricas
+
+class ServerBusy(Exception):
+    """Se ha alcanzado el máximo de peticiones en curso"""
+
+class _Pending:
+    __slots__ = ('text', 'changes', 'deadline', 'event', 'response')
+
+    def __init__(self, text, changes, deadline):
+        self.text = text
+        self.changes = changes
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.response = None
+
+class BatchDispatcher:
+    """
+    Agrupa las peticiones que llegan casi a la vez (hasta `max_batch` o
+    `max_batch_bytes`, esperando como mucho `max_wait` segundos) y envía cada
+    lote a un proceso del grupo. `max_in_flight` limita las peticiones
+    aceptadas que aún no tienen respuesta.
+    """
+    def __init__(self, pool, max_batch=32, max_batch_bytes=262144, max_wait=0.002, max_in_flight=256,
+                 metrics=None):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_batch_bytes = max_batch_bytes
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'rejected': 0, 'errors': 0}
+        self._thread = threading.Thread(target=self._run, name='despachador', daemon=True)
+        self._thread.start()
+
+    def submit(self, requests, timeout=None):
+        """
+        Corrige una lista de (texto, con_cambios, plazo) y devuelve sus respuestas en
+        el mismo orden. Lanza ServerBusy si no caben en el límite de peticiones
+        en curso.
+        """
+        acquired = 0
+        for _ in requests:
+            if not self._slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self._slots.release()
+                with self._lock:
+                    self.stats['rejected'] += len(requests)
+                raise ServerBusy()
+            acquired += 1
+
+        # Cada petición ocupa su plaza hasta que su lote termina (_deliver o
+        # _fail), aunque el cliente deje de esperarla
+        pending = [_Pending(text, changes, deadline) for text, changes, deadline in requests]
+        for item in pending:
+            self._queue.put(item)
+        for item in pending:
+            if not item.event.wait(timeout):
+                raise TimeoutError("Tiempo de espera agotado")
+        with self._lock:
+            self.stats['requests'] += len(pending)
+        return [item.response for item in pending]
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            size = len(first.text)
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch and size < self.max_batch_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                size += len(item.text)
+
+            with self._lock:
+                self.stats['batches'] += 1
+            try:
+                self.pool.apply_async(_corregir_textos,
+                                      ([(item.text, item.changes, item.deadline) for item in batch],),
+                                      callback=lambda result, batch=batch: self._deliver(batch, result),
+                                      error_callback=lambda error, batch=batch: self._fail(batch, error))
+            except Exception as error:
+                self._fail(batch, error)
+
+    def _deliver(self, batch, result):
+        responses, metrics = result
+        try:
+            if metrics and self.metrics is not None:
+                self.metrics.merge(metrics)
+        finally:
+            for item, response in zip(batch, responses):
+                item.response = response
+                item.event.set()
+            self._release(batch)
+
+    def _fail(self, batch, error):
+        with self._lock:
+            self.stats['errors'] += len(batch)
+        for item in batch:
+            item.response = {'error': str(error)}
+            item.event.set()
+        self._release(batch)
+
+    def _release(self, batch):
+        """Libera las plazas de un lote terminado"""
+        for _ in batch:
+            self._slots.release()
+
+def _leer_peticion(dato, presupuesto_ms=None):
+    """
+    Valida una petición JSON y devuelve (texto, con_cambios, plazo). El
+    plazo sale de "budget_ms" (o del presupuesto por defecto del servidor)
+    contado desde ahora.
+    """
+    if not isinstance(dato, dict) or not isinstance(dato.get('text'), str):
+        raise ValueError("Se esperaba un objeto con el campo 'text'")
+    presupuesto = dato.get('budget_ms', presupuesto_ms)
+    if presupuesto is not None and (isinstance(presupuesto, bool) or not isinstance(presupuesto, (int, float))):
+        raise ValueError("El campo 'budget_ms' debe ser un número")
+    plazo = time.monotonic() + presupuesto / 1000 if presupuesto is not None else None
+    return dato['text'], bool(dato.get('changes', False)), plazo
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, estado, cuerpo, tipo='application/json'):
+        datos = cuerpo.encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', f'{tipo}; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        if estado == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        servidor = self.server
+        if self.path == '/salud':
+            self._responder(200, json.dumps({'estado': 'ok', **servidor.dispatcher.stats}))
+        elif self.path == '/metricas' and servidor.metrics is not None:
+            self._responder(200, servidor.metrics.to_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._responder(404, json.dumps({'error': 'no encontrado'}))
+
+    def do_POST(self):
+        servidor = self.server
+        if self.path != '/corregir':
+            self._responder(404, json.dumps({'error': 'no encontrado'}))
+            return
+
+        # La longitud se valida antes de leer el cuerpo: sin ella no se sabe
+        # dónde termina y una negativa dejaría el hilo leyendo hasta el cierre
+        cabecera = self.headers.get('Content-Length')
+        if cabecera is None:
+            self._responder(411, json.dumps({'error': 'falta Content-Length'}))
+            self.close_connection = True
+            return
+        try:
+            longitud = int(cabecera)
+        except ValueError:
+            longitud = -1
+        if longitud < 0:
+            self._responder(400, json.dumps({'error': 'Content-Length no válido'}))
+            self.close_connection = True
+            return
+        if longitud > servidor.max_body:
+            self._responder(413, json.dumps({'error': 'petición demasiado grande'}))
+            self.close_connection = True
+            return
+        cuerpo = self.rfile.read(longitud)
+
+        # Un objeto JSON o, con Content-Type application/x-ndjson, varias
+        # peticiones JSONL
+        tipo = self.headers.get('Content-Type') or ''
+        jsonl = 'ndjson' in tipo or 'jsonl' in tipo
+        try:
+            # UnicodeDecodeError es un ValueError: un cuerpo que no es UTF-8
+            # también se responde con 400
+            cuerpo = cuerpo.decode('utf-8')
+            if jsonl:
+                peticiones = [_leer_peticion(json.loads(linea), servidor.budget_ms)
+                              for linea in cuerpo.splitlines() if linea.strip()]
+            else:
+                peticiones = [_leer_peticion(json.loads(cuerpo), servidor.budget_ms)]
+        except ValueError as e:
+            self._responder(400, json.dumps({'error': str(e)}, ensure_ascii=False))
+            return
+
+        try:
+            respuestas = servidor.dispatcher.submit(peticiones, servidor.timeout_seconds)
+        except ServerBusy:
+            self._responder(503, json.dumps({'error': 'servidor saturado'}))
+            return
+        except TimeoutError as e:
+            self._responder(504, json.dumps({'error': str(e)}, ensure_ascii=False))
+            return
+
+        if jsonl:
+            self._responder(200, ''.join(json.dumps(respuesta, ensure_ascii=False) + '\n' for respuesta in respuestas),
+                            'application/x-ndjson')
+        else:
+            self._responder(200, json.dumps(respuestas[0], ensure_ascii=False))
+
+class _UnixHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        servidor = self.server
+        for linea in self.rfile:
+            if not linea.strip():
+                continue
+            try:
+                respuesta = servidor.dispatcher.submit([_leer_peticion(json.loads(linea), servidor.budget_ms)],
+                                                       servidor.timeout_seconds)[0]
+            except ServerBusy:
+                respuesta = {'error': 'servidor saturado', 'status': 503}
+            except (ValueError, TimeoutError) as e:
+                respuesta = {'error': str(e)}
+            self.wfile.write((json.dumps(respuesta, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def servir(opciones, procesos=None, host='127.0.0.1', puerto=8765, ruta_socket=None, max_lote=32,
+           espera_ms=2.0, max_en_vuelo=256, max_cuerpo=8 * 1024 * 1024, timeout=60.0, artefacto=None,
+           presupuesto_ms=None):
+    """Arranca el grupo de procesos y atiende peticiones hasta Ctrl+C"""
+    global _corrector_servidor
+
+    # El corrector se construye antes del fork para compartirlo entre procesos
+    _corrector_servidor = _crear_corrector(opciones, artefacto)
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context('fork' if 'fork' in metodos else None)
+    pool = contexto.Pool(procesos, initializer=_inicializar_proceso, initargs=(opciones, artefacto))
+    metricas = CorrectorMetrics() if opciones.get('metrics') else None
+    despachador = BatchDispatcher(pool, max_batch=max_lote, max_wait=espera_ms / 1000,
+                                  max_in_flight=max_en_vuelo, metrics=metricas)
+
+    if ruta_socket:
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+        servidor = _UnixServer(ruta_socket, _UnixHandler)
+        direccion = f"unix:{ruta_socket}"
+    else:
+        servidor = ThreadingHTTPServer((host, puerto), _HTTPHandler)
+        servidor.daemon_threads = True
+        direccion = f"http://{host}:{servidor.server_address[1]}"
+    servidor.dispatcher = despachador
+    servidor.metrics = metricas
+    servidor.max_body = max_cuerpo
+    servidor.timeout_seconds = timeout
+    servidor.budget_ms = presupuesto_ms
+
+    print(f"Servidor de corrección en {direccion} con {procesos or os.cpu_count()} procesos")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el servidor...")
+    finally:
+        servidor.server_close()
+        despachador.close()
+        pool.close()
+        pool.join()
+        if ruta_socket and os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+
+def _conexion(destino):
+    """Devuelve una función que envía una petición y devuelve (estado, cuerpo)"""
+    if destino.startswith('unix:'):
+        cliente = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        cliente.connect(destino[5:])
+        lector = cliente.makefile('rb')
+
+        def enviar(peticion):
+            cliente.sendall((json.dumps(peticion, ensure_ascii=False) + '\n').encode('utf-8'))
+            respuesta = json.loads(lector.readline())
+            return respuesta.get('status', 500 if 'error' in respuesta else 200), respuesta
+        return enviar
+
+    partes = urlsplit(destino)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80)
+
+    def enviar(peticion):
+        conexion.request('POST', '/corregir', json.dumps(peticion, ensure_ascii=False).encode('utf-8'),
+                         {'Content-Type': 'application/json'})
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    return enviar
+
+def generar_carga(destino, peticiones=1000, concurrencia=8, palabras=60, con_cambios=False, semilla=1,
+                  presupuesto_ms=None):
+    """
+    Envía `peticiones` textos sintéticos desde `concurrencia` clientes y
+    muestra peticiones por segundo y latencias p50/p99.
+    """
+    from benchmark_corrector import generar_corpus, percentil
+
+    textos = generar_corpus(TextCorrector(), documentos=min(peticiones, 500), palabras=palabras, semilla=semilla)
+    latencias = []
+    estados = {}
+    lock = threading.Lock()
+    siguiente = iter(range(peticiones))
+    plantilla = {'changes': con_cambios}
+    if presupuesto_ms is not None:
+        plantilla['budget_ms'] = presupuesto_ms
+
+    def cliente():
+        enviar = _conexion(destino)
+        while True:
+            with lock:
+                indice = next(siguiente, None)
+            if indice is None:
+                return
+            inicio = time.perf_counter()
+            estado, _ = enviar({'text': textos[indice % len(textos)], **plantilla})
+            duracion = time.perf_counter() - inicio
+            with lock:
+                latencias.append(duracion)
+                estados[estado] = estados.get(estado, 0) + 1
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente) for _ in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    resultado = {
+        'peticiones': len(latencias),
+        'segundos': round(segundos, 4),
+        'peticiones_s': round(len(latencias) / max(segundos, 1e-9), 1),
+        'latencia_ms': {'p50': round(percentil(latencias, 50) * 1000, 3),
+                        'p99': round(percentil(latencias, 99) * 1000, 3)},
+        'estados': estados
+    }
+    print(f"Peticiones: {resultado['peticiones']} en {segundos:.2f} s ({resultado['peticiones_s']} pet/s)")
+    print(f"Latencia: p50 {resultado['latencia_ms']['p50']:.2f} ms, p99 {resultado['latencia_ms']['p99']:.2f} ms")
+    print(f"Respuestas por estado: {estados}")
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de corrección de textos en español")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--socket', metavar='RUTA', help="Atiende por un socket Unix en lugar de HTTP")
+    parser.add_argument('--procesos', type=int, metavar='N', help="Procesos del grupo (por defecto, uno por núcleo)")
+    parser.add_argument('--max-lote', type=int, default=32, metavar='N',
+                        help="Peticiones como máximo por lote enviado a un proceso")
+    parser.add_argument('--espera-ms', type=float, default=2.0,
+                        help="Tiempo máximo de espera para completar un lote")
+    parser.add_argument('--max-en-vuelo', type=int, default=256, metavar='N',
+                        help="Peticiones en curso a partir de las que se responde 503")
+    parser.add_argument('--lexico', metavar='RUTA', help="Léxico compilado que se usará como diccionario")
+    parser.add_argument('--abreviaturas', metavar='RUTA', help="Tabla de abreviaturas")
+    parser.add_argument('--aceptadas', metavar='RUTA',
+                        help="Vocabulario aprendido del corpus (corrector_texto.py --aprender)")
+    parser.add_argument('--motor', choices=TextCorrector.SPELLING_ENGINES, default='difflib',
+                        help="Motor para ordenar los candidatos de corrección ortográfica")
+    parser.add_argument('--artefacto', metavar='RUTA', help="Carga el corrector de un artefacto precompilado")
+    parser.add_argument('--presupuesto-ms', type=float, metavar='MS',
+                        help="Plazo por petición si no trae 'budget_ms' (también para la carga generada)")
+    parser.add_argument('--metricas', action='store_true', help="Activa las métricas (GET /metricas)")
+    parser.add_argument('--carga', metavar='DESTINO',
+                        help="Genera carga contra un servidor (http://host:puerto o unix:RUTA)")
+    parser.add_argument('--peticiones', type=int, default=1000)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--palabras', type=int, default=60, help="Palabras medias por petición de carga")
+    parser.add_argument('--con-cambios', action='store_true', help="Pide también la lista de cambios")
+    args = parser.parse_args()
+
+    if args.carga:
+        generar_carga(args.carga, args.peticiones, args.concurrencia, args.palabras, args.con_cambios,
+                      presupuesto_ms=args.presupuesto_ms)
+        return 0
+
+    opciones = {
+        'lexicon_path': args.lexico,
+        'abbreviations_path': args.abreviaturas,
+        'accepted_path': args.aceptadas,
+        'metrics': args.metricas,
+        'spelling_engine': args.motor
+    }
+    servir(opciones, args.procesos, args.host, args.puerto, args.socket, args.max_lote, args.espera_ms,
+           args.max_en_vuelo, artefacto=args.artefacto, presupuesto_ms=args.presupuesto_ms)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
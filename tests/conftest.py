@@ -0,0 +1,41 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_corrector import generar_corpus
+from corrector_texto import TextCorrector
+
+# Casos límite: un carácter que quita la etapa de caracteres especiales
+# justo donde un corte separaría una abreviatura o un párrafo
+CASOS_LIMITE = [
+    "uno dos tres cuatro cinco seis siete ocho a. #C.,,,,,,,,,,,,\n",
+    "Entre el 400 a.\n\n#C. y más\n",
+    "Habitaron la zona entre el 1500 a. @ C. y el 400 a.\n\n€C.\n\nEl año #1810 y el año\n\n1821.\n",
+]
+
+def ensuciar(texto, rng, tasa=0.05):
+    """Intercala caracteres que la etapa de caracteres especiales elimina y algún salto de párrafo"""
+    partes = []
+    for parte in texto.split(' '):
+        azar = rng.random()
+        if azar < tasa:
+            parte = rng.choice('#@€~*') + parte
+        elif azar < 2 * tasa:
+            parte = '\n\n' + parte
+        partes.append(parte)
+    return ' '.join(partes)
+
+@pytest.fixture(scope='session')
+def corrector():
+    return TextCorrector()
+
+@pytest.fixture(scope='session')
+def textos(corrector):
+    """Textos sintéticos con errores, abreviaturas y caracteres especiales, más los casos límite"""
+    rng = random.Random(7)
+    corpus = generar_corpus(corrector, documentos=12, palabras=200, tasa_abreviaturas=0.05, semilla=3)
+    return [ensuciar(texto, rng) for texto in corpus] + CASOS_LIMITE
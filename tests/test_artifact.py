@@ -0,0 +1,21 @@
+from corrector_texto import TextCorrector, compile_lexicon
+
+def test_saved_artifact_corrects_like_the_original(corrector, textos, tmp_path):
+    ruta = str(tmp_path / 'corrector.bin')
+    corrector.save(ruta)
+    cargado = TextCorrector.load(ruta)
+    assert cargado.correction_cache.fingerprint == corrector.correction_cache.fingerprint
+    for texto in textos:
+        assert cargado.correct(texto).text == corrector.correct(texto).text
+
+def test_artifact_with_mapped_lexicon(corrector, textos, tmp_path):
+    lexico = str(tmp_path / 'lexico.bin')
+    compile_lexicon(corrector.dictionary, lexico)
+    mapeado = TextCorrector(lexicon_path=lexico)
+    ruta = str(tmp_path / 'corrector.bin')
+    mapeado.save(ruta)
+    cargado = TextCorrector.load(ruta)
+    for texto in textos:
+        esperado = mapeado.correct(texto).text
+        assert esperado == corrector.correct(texto).text
+        assert cargado.correct(texto).text == esperado
@@ -0,0 +1,33 @@
+from corrector_texto import TextCorrector
+
+def test_persisted_cache_gives_the_same_results(corrector, textos, tmp_path):
+    ruta = str(tmp_path / 'cache.json')
+    primero = TextCorrector(cache_path=ruta)
+    for texto in textos:
+        primero.correct(texto)
+    primero.save_cache()
+    
+    segundo = TextCorrector(cache_path=ruta)
+    assert len(segundo.correction_cache.entries) == len(primero.correction_cache.entries)
+    for texto in textos:
+        assert segundo.correct(texto).text == corrector.correct(texto).text
+    assert segundo.correction_cache.stats()['hits']
+
+def test_cache_from_another_configuration_is_discarded(tmp_path):
+    ruta = str(tmp_path / 'cache.json')
+    distancia_tres = TextCorrector(cache_path=ruta)
+    assert distancia_tres.correct("la rvolcion").text == "la revolución"
+    distancia_tres.save_cache()
+    
+    distancia_uno = TextCorrector(max_edit_distance=1, cache_path=ruta)
+    assert not distancia_uno.correction_cache.entries
+    assert distancia_uno.correct("la rvolcion").text == TextCorrector(max_edit_distance=1).correct("la rvolcion").text
+
+def test_same_size_dictionary_edit_invalidates_cache():
+    corrector = TextCorrector()
+    assert corrector.correct("la independensia").text == "la independencia"
+    tamaño = len(corrector.dictionary)
+    corrector.dictionary.discard('independencia')
+    corrector.dictionary.add('independencias')
+    assert len(corrector.dictionary) == tamaño
+    assert corrector.correct("la independensia").text == "la independencias"
@@ -0,0 +1,15 @@
+from corrector_texto import TextCorrector
+
+def test_normalized_hits_are_not_fuzzy_lookups():
+    corrector = TextCorrector(metrics=True)
+    corrector.correct("La revoluzion y el rvolcion\n")
+    contadores = corrector.metrics.snapshot()['counters']
+    assert contadores['oov'] == 2
+    assert contadores['normalized_hits'] == 1
+    assert contadores['fuzzy_lookups'] == 1
+    
+    # Repetidas, las dos salen de la caché sin volver a ningún nivel
+    corrector.correct("La revoluzion y el rvolcion\n")
+    contadores = corrector.metrics.snapshot()['counters']
+    assert contadores['fuzzy_lookups'] == 1
+    assert contadores['cache_hits'] == 2
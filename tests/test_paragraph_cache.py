@@ -0,0 +1,19 @@
+from conftest import CASOS_LIMITE
+from corrector_texto import TextCorrector
+
+def test_paragraph_cache_does_not_change_results(corrector, textos, tmp_path):
+    cacheado = TextCorrector(paragraph_cache_size=1000, paragraph_cache_path=str(tmp_path / 'parrafos.db'))
+    # La segunda vuelta sale de la caché
+    for _ in range(2):
+        for texto in textos:
+            resultado = cacheado.correct(texto)
+            assert resultado.text == corrector.correct(texto).text
+            assert resultado.changes.corrected_text() == resultado.text
+    assert cacheado.paragraph_cache.stats()['hits']
+    cacheado.paragraph_cache.close()
+
+def test_paragraph_split_keeps_abbreviation_behind_removed_char(corrector):
+    texto = CASOS_LIMITE[1]
+    cacheado = TextCorrector(paragraph_cache_size=10)
+    assert corrector.correct(texto).text == "Entre el cuatrocientos antes de Cristo y más\n"
+    assert cacheado.correct(texto).text == corrector.correct(texto).text
@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import CASOS_LIMITE
+from corrector_texto import procesar_particionado
+
+@pytest.mark.parametrize('shard_size', [16, 200, 4096])
+def test_shards_correct_to_the_single_result(corrector, textos, shard_size):
+    for texto in textos:
+        datos = texto.encode('utf-8')
+        offsets = corrector.shard_offsets(datos, shard_size)
+        partes = [datos[inicio:fin].decode('utf-8') for inicio, fin in zip(offsets, offsets[1:] + [len(datos)])]
+        assert ''.join(corrector.correct(parte).text for parte in partes) == corrector.correct(texto).text
+
+def test_shard_offsets_keep_abbreviation_behind_removed_char(corrector):
+    datos = CASOS_LIMITE[0].encode('utf-8')
+    offsets = corrector.shard_offsets(datos, 10)
+    assert not any(datos[:inicio].endswith(b'a. ') for inicio in offsets[1:])
+
+def test_partitioned_file_is_identical(corrector, textos, tmp_path):
+    texto = ''.join(textos)
+    entrada = tmp_path / 'entrada.txt'
+    salida = tmp_path / 'salida.txt'
+    entrada.write_text(texto, encoding='utf-8')
+    procesar_particionado(str(entrada), str(salida), corrector, {}, jobs=2, tam_particion=512)
+    assert salida.read_text(encoding='utf-8') == corrector.correct(texto).text
@@ -0,0 +1,22 @@
+import io
+
+import pytest
+
+from conftest import CASOS_LIMITE
+
+@pytest.mark.parametrize('chunk_size', [10, 64, 1000])
+def test_stream_matches_correct(corrector, textos, chunk_size):
+    for texto in textos:
+        esperado = corrector.correct(texto).text
+        fragmentos = corrector.correct_stream(io.StringIO(texto), chunk_size=chunk_size)
+        assert ''.join(fragmentos) == esperado
+
+def test_stream_does_not_split_abbreviation_behind_removed_char(corrector):
+    texto = CASOS_LIMITE[0]
+    assert corrector.correct(texto).text.endswith("antes de Cristo,,,,,,,,,,,,\n")
+    assert ''.join(corrector.correct_stream(io.StringIO(texto), chunk_size=10)) == corrector.correct(texto).text
+
+def test_stream_changes_rebuild_chunks(corrector, textos):
+    for texto in textos:
+        for fragmento in corrector.correct_stream(io.StringIO(texto), chunk_size=64, with_changes=True):
+            assert fragmento.changes.corrected_text() == fragmento.text
@@ -0,0 +1,17 @@
+from corrector_texto import VocabularyLearner
+
+def test_promote_learns_consistent_words():
+    learner = VocabularyLearner()
+    for _ in range(3):
+        learner.add_document("el tlatoani y el tlatoani")
+    assert learner.promote(min_count=5, min_documents=2) == ['tlatoani']
+
+def test_promote_counts_pruned_occurrences_against_variants():
+    learner = VocabularyLearner(max_entries=4)
+    # La forma correcta aparece antes (7 veces) y se pierde en la poda
+    learner.add_document(" ".join(["revolución"] * 7 + ["casa", "perro", "gato", "luna"] * 8))
+    for _ in range(3):
+        learner.add_document("revolucion revolucion")
+    assert 'revolución' not in learner.counts
+    assert learner.error
+    assert learner.promote(min_count=5, min_documents=2) == []